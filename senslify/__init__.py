@@ -16,32 +16,47 @@
 #   as well as a way to launch the application.
 
 
-# monkey patch everything ahead of time
-from gevent import monkey
-monkey.patch_all()
-
-import asyncio, getpass, os, sys
+import asyncio, collections, functools, getpass, os, signal, socket, sys, time
 import aiohttp, aiohttp_jinja2, jinja2
-import config, simplejson
+import config
 
 # change the Provider import here if you want to use different one
 #   You'll need to change it below too where I have marked
 from senslify.db import (
-    database_shutdown_handler, MongoProvider, PostGresProvider, SQLServerProvider
+    database_startup_handler, database_shutdown_handler, MongoProvider,
+    PostGresProvider, SQLServerProvider
 )
-from senslify.errors import DBError, traceback_str
+from senslify.errors import traceback_str
 
 # import the various route handlers
 from senslify.index import index_handler
+from senslify.middlewares import compression_middleware
 from senslify.rest import rest_handler
 from senslify.sensors import info_handler, sensors_handler
-from senslify.sockets import socket_shutdown_handler, ws_handler
+from senslify.sockets import Room, socket_shutdown_handler, socket_startup_handler, ws_handler
 
 # import the filters module, import filters on an as needed basis
 import senslify.filters
 
 
-def create_db(conn_str, db_provider, auth_required):
+# the number of compiled templates jinja2 keeps in memory
+TEMPLATE_CACHE_SIZE = 400
+
+# the number of seconds idle HTTP connections are kept alive for
+KEEPALIVE_TIMEOUT = 75
+
+# the number of seconds to wait before replacing a worker process that exited,
+#   the wait doubles with each recent restart up to WORKER_RESTART_MAX_S
+WORKER_RESTART_S = 1
+WORKER_RESTART_MAX_S = 30
+
+# the server gives up once its workers have been replaced this many times
+#   within WORKER_RESTART_WINDOW_S seconds, the failure is not transient
+WORKER_RESTART_LIMIT = 5
+WORKER_RESTART_WINDOW_S = 60
+
+
+def create_db(conn_str, db_provider, auth_required, pool_size=None, min_pool_size=None):
     """Returns an instance of a DatabaseProvider class based on the value of \'db_provider\'.
     \'conn_str\' must be a suitable connection string for the appropriate database
     provider. Both \'db_provider\' and \'conn_str\' are specified in the Senslify configuration
@@ -52,6 +67,10 @@ def create_db(conn_str, db_provider, auth_required):
         conn_str (str): The base connection string.
         db_provider (str): The database provider to use.
         auth_required (boolean): Is authentication required to connect to the database?
+        pool_size (int): The maximum number of pooled connections, only used by
+        the MONGO provider (default: None, use the provider default).
+        min_pool_size (int): The minimum number of pooled connections, only used by
+        the MONGO provider (default: None, use the provider default).
 
     Returns:
         (DatabaseProvider): An instance of a subclass of the DatabaseProvider class.
@@ -62,8 +81,13 @@ def create_db(conn_str, db_provider, auth_required):
         username = input('Username: ')
         password = getpass.getpass()
     if db_provider == 'MONGO':
-        return MongoProvider(conn_str, username=username, password=password)
-    elif db_provider == 'SQL_SERVER' or db == 'POSTGRES':
+        pool = dict()
+        if pool_size is not None:
+            pool['pool_size'] = int(pool_size)
+        if min_pool_size is not None:
+            pool['min_pool_size'] = int(min_pool_size)
+        return MongoProvider(conn_str, username=username, password=password, **pool)
+    elif db_provider == 'SQL_SERVER' or db_provider == 'POSTGRES':
         if username and password:
             conn_str += f'UID={username};PWD={password};'
             username = None
@@ -85,23 +109,126 @@ def init_service_worker(timeout=7):
     pass # Not implemented as of yet
 
 
+@functools.lru_cache(maxsize=1)
 def get_local_ip():
-    """Gets the local IP address of the host running the server."""
-
-    import socket
+    """Gets the local IP address of the host running the server. The address
+    is the one the host would route outbound traffic from, connecting a UDP
+    socket sends no packets. The result is cached.
 
+    Returns:
+        (str): The local IP address of the host, or 127.0.0.1 if it has no
+        route.
+    """
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
         # doesn't even have to be reachable
         s.connect(('10.255.255.255', 1))
         IP = s.getsockname()[0]
-    except:
+    except OSError:
         IP = '127.0.0.1'
     finally:
         s.close()
     return IP
 
 
+def _spawn_worker(run):
+    """Forks a worker process that calls `run` and exits once it returns.
+
+    Args:
+        run (callable): Runs the server in the worker, takes no arguments.
+
+    Returns:
+        (int): The pid of the worker process.
+    """
+    # anything still buffered would otherwise be written by both processes
+    sys.stdout.flush()
+    sys.stderr.flush()
+    # hold signals across the fork, a signal reaching the worker before its
+    #   handlers are reset would otherwise run the supervisors handler
+    signals = {signal.SIGINT, signal.SIGTERM}
+    signal.pthread_sigmask(signal.SIG_BLOCK, signals)
+    pid = os.fork()
+    if pid != 0:
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, signals)
+        return pid
+    # leave the terminals process group, a Ctrl-C reaches the worker once
+    #   through the supervisor rather than twice
+    os.setpgid(0, 0)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, signals)
+    code = 0
+    try:
+        run()
+    except BaseException as e:
+        print(traceback_str(e))
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def supervise_workers(workers, run):
+    """Runs the server in `workers` forked processes and waits for them.
+    SIGINT and SIGTERM are forwarded to the workers as SIGTERM, and a worker
+    that exits while the server is not shutting down is replaced with an
+    exponential backoff. If workers keep exiting the remaining workers are
+    stopped and the server exits.
+
+    Args:
+        workers (int): The number of worker processes to run.
+        run (callable): Runs the server in a worker, takes no arguments.
+    """
+    children = set()
+    stopping = False
+    # the times of the recent restarts, oldest first
+    restarts = collections.deque()
+
+    def stop():
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def forward(signum, frame):
+        stop()
+
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+    for _ in range(workers):
+        children.add(_spawn_worker(run))
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if stopping:
+            continue
+        now = time.monotonic()
+        while restarts and now - restarts[0] > WORKER_RESTART_WINDOW_S:
+            restarts.popleft()
+        if len(restarts) >= WORKER_RESTART_LIMIT:
+            print(f'ERROR: Worker {pid} exited with status {status}, workers exited {len(restarts) + 1} times in {WORKER_RESTART_WINDOW_S} seconds, shutting down!')
+            stop()
+            for pid in children:
+                try:
+                    os.waitpid(pid, 0)
+                except ChildProcessError:
+                    pass
+            sys.exit(-1)
+        delay = min(WORKER_RESTART_MAX_S, WORKER_RESTART_S * 2 ** len(restarts))
+        print(f'WARNING: Worker {pid} exited with status {status}, starting a replacement in {delay} seconds...')
+        restarts.append(now)
+        time.sleep(delay)
+        if not stopping:
+            children.add(_spawn_worker(run))
+
+
 def build_app(config_file='./senslify/config/senslify.conf'):
     """ Factory function that creates a new instance of the server with
     the given configuration.
@@ -112,7 +239,7 @@ def build_app(config_file='./senslify/config/senslify.conf'):
     """
     # create the application and setup the file loader
     print('Configuring jinja2 template engine...')
-    app = aiohttp.web.Application()
+    app = aiohttp.web.Application(middlewares=[compression_middleware])
     loader=jinja2.FileSystemLoader(
         [os.path.join(os.path.dirname(__file__), "templates")]
     )
@@ -121,15 +248,24 @@ def build_app(config_file='./senslify/config/senslify.conf'):
     filters = {
         "date": senslify.filters.filter_date, # YYYY-MM-DD date format
         "datetime": senslify.filters.filter_datetime, # i18n datetime filter
-        "simplejson_dumps": simplejson.dumps,
+        "json_dumps": senslify.filters.filter_json, # orjson backed json filter where available
         "rstring": senslify.filters.filter_reading # custom reading filter
     }
 
     # setup the root url for static content like js/css
     app['static_root_url'] = '/static'
 
-    # setup the application
-    aiohttp_jinja2.setup(app, loader=loader, filters=filters)
+    # setup the application, templates are compiled once and cached in memory
+    #   as well as on disk so they survive restarts, jinja2 keeps the disk
+    #   cache in a private per-user directory and checks its ownership
+    app['jinja_env'] = aiohttp_jinja2.setup(
+        app,
+        loader=loader,
+        filters=filters,
+        auto_reload=False,
+        cache_size=TEMPLATE_CACHE_SIZE,
+        bytecode_cache=jinja2.FileSystemBytecodeCache()
+    )
 
     # setup the application configuration and any global variables
     print('Loading config file...')
@@ -142,9 +278,13 @@ def build_app(config_file='./senslify/config/senslify.conf'):
         app['db'] = create_db(
             app['config'].conn_str, 
             app['config'].db_provider,
-            app['config'].auth_required
+            app['config'].auth_required,
+            # the pool keys are optional, None keeps the provider default
+            app['config'].get('pool_size', None),
+            app['config'].get('min_pool_size', None)
         )
-        app['db'].open()
+        # the connection itself is opened by the startup handler once the
+        #   event loop is running
         app['db'].init()
     except Exception as e:
         if app['config'].debug:
@@ -153,8 +293,15 @@ def build_app(config_file='./senslify/config/senslify.conf'):
             print('ERROR: Unable to connect to the primary database, cannot continue!')
         sys.exit(-1)
 
-    # setup the ws rooms
-    app['rooms'] = dict()
+    # setup the ws rooms, rooms are created on first join
+    app['rooms'] = collections.defaultdict(Room)
+
+    # the number of server processes, each process only holds the rooms for
+    #   its own WebSockets
+    app['workers'] = max(1, int(app['config'].get('workers', 1)))
+
+    # whether WebSockets negotiate permessage-deflate
+    app['ws_compress'] = bool(app['config'].get('ws_compress', True))
 
     # register resources for the routes
     app.router.add_resource(r'/', name='index')
@@ -170,9 +317,14 @@ def build_app(config_file='./senslify/config/senslify.conf'):
     app.router.add_route('GET', '/ws', ws_handler)
     app.router.add_route('POST', '/rest', rest_handler)
 
-    # register any shutdown handlers
-    app.on_shutdown.append(database_shutdown_handler)
+    # register any startup handlers
+    app.on_startup.append(database_startup_handler)
+    app.on_startup.append(socket_startup_handler)
+
+    # register any shutdown handlers, the sockets go first so the reading
+    #   watch is cancelled before the database is closed
     app.on_shutdown.append(socket_shutdown_handler)
+    app.on_shutdown.append(database_shutdown_handler)
 
     # initialize the service worker if necessary
     if bool(app['config'].migration_enabled):
@@ -187,18 +339,43 @@ def main():
     a configuration file to use with the server.
     """
 
+    # run the event loop on uvloop where it is available
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        print('Using the uvloop event loop...')
+    except ImportError:
+        print('uvloop is not installed, using the default asyncio event loop...')
+
     # get the app
     if len(sys.argv) == 2:
-        app = build_app(config_file=sys.argv[2])
+        app = build_app(config_file=sys.argv[1])
     else:
         app = build_app()
-    # launch the web app
+    # launch the web app, an ip set in the config takes precedence over the
+    #   address looked up from the host
     ip = app['config'].ip
     if ip:
         host = ip
     else:
         host = get_local_ip()
-    aiohttp.web.run_app(app, host=host, port=app['config'].port)
+    run = functools.partial(
+        aiohttp.web.run_app,
+        app, 
+        host=host, 
+        port=app['config'].port, 
+        keepalive_timeout=KEEPALIVE_TIMEOUT
+    )
+    # fork the workers, every worker binds the same port with SO_REUSEPORT and
+    #   the kernel balances connections between them, this process only
+    #   supervises them
+    if app['workers'] > 1:
+        if hasattr(os, 'fork'):
+            supervise_workers(app['workers'], functools.partial(run, reuse_port=True))
+            return
+        print('WARNING: Multiple workers are not supported on this platform, running a single worker!')
+        app['workers'] = 1
+    run()
 
 
 if __name__ == '__main__':
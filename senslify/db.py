@@ -30,11 +30,22 @@
 #   a secondary provider for the Senslify web application.
 
 
-import asyncio, bson, pymongo, pyodbc, sys
-from contextlib import contextmanager
+import asyncio, bson, motor.motor_asyncio, pymongo, pyodbc, sys
+from contextlib import asynccontextmanager, contextmanager
 from senslify.errors import DBError
 
 
+async def database_startup_handler(app):
+    """Defines a handler for opening the application database once the event
+    loop is running, asynchronous drivers bind to the loop they are opened on.
+
+    Args:
+        app (aiohttp.web.Application): An instance of the Senslify application.
+    """
+    if 'db' in app:
+        app['db'].open()
+
+
 async def database_shutdown_handler(app):
     """Defines a handler for gracefully shutting down the application database.
 
@@ -237,6 +248,18 @@ class DatabaseProvider:
         raise NotImplementedError
 
 
+    async def get_groups_list(self, length=None):
+        """Returns the groups in the database as a list in a single call.
+
+        Args:
+            length (int): The maximum number of groups to return (default: None, all groups).
+
+        Returns:
+            (list): A list of the groups in the database.
+        """
+        raise NotImplementedError
+
+
     async def get_rtypes(self):
         """Generator function used to get reading types from the database."""
         raise NotImplementedError
@@ -259,6 +282,8 @@ class DatabaseProvider:
             groupid (int): The id of the group the sensor belongs to.
             rtypeid (int): The id of the rtype corresponding the reading type to return (default: None).
             limit (int): The number of readings to return in a single call (default: 100).
+
+        Readings are returned most recent first.
         """
         raise NotImplementedError
 
@@ -363,23 +388,42 @@ class DatabaseProvider:
         raise NotImplementedError
 
 
+    async def watch_readings(self):
+        """Generator function that yields readings as they are inserted into
+        the database by any server process.
+        """
+        raise NotImplementedError
+
+
 class MongoProvider(DatabaseProvider):
     """Represents a unique connection to a MongoDB instance. Each instance of
     this class represents an individual connection to the MongoDB database.
 
     The functions in this class are asynchronous. To acheive this, I employ
-    gevent and monkey patching. That said, at any time, the result of any
-    of these functions are not guaranteed to be accurate reflections of the
-    database (not that they would anyway - in reality, unless a Session object
-    is used, MongoDB only provides atomicity at the collection level).
+    Motor, the asyncio driver for MongoDB, so database calls never block the
+    event loop. That said, at any time, the result of any of these functions
+    are not guaranteed to be accurate reflections of the database (not that
+    they would anyway - in reality, unless a Session object is used, MongoDB
+    only provides atomicity at the collection level).
     """
 
     # the maximum time in milliseconds that aggregate operations are limited
     #   to running on the server
     MAX_AGGREGATE_MS = 2500
 
+    # the default maximum number of connections the client keeps open to the server
+    MAX_POOL_SIZE = 50
+
+    # the default minimum number of connections the client keeps open to the server
+    MIN_POOL_SIZE = 0
+
+    # the maximum time in milliseconds an operation waits for a free pooled
+    #   connection before failing
+    WAIT_QUEUE_TIMEOUT_MS = 2000
+
     def __init__(self, conn_str='mongodb://127.0.0.1:27001', db='senslify',
-            username=None, password=None):
+            username=None, password=None, pool_size=MAX_POOL_SIZE,
+            min_pool_size=MIN_POOL_SIZE):
         """Returns an object capable of interacting with the Senslify MongoDB
         database. You must manually open the connection by calling open()
         on the provider before you can use the providers methods.
@@ -390,8 +434,12 @@ class MongoProvider(DatabaseProvider):
             db (str): The name of the Senslify database (default senslify)
             username (str): The username to connect to the database with (default=None).
             password (str): The password corresponding to the username (default=None).
+            pool_size (int): The maximum number of pooled connections (default: 50).
+            min_pool_size (int): The minimum number of pooled connections (default: 0).
         """
         DatabaseProvider.__init__(self, conn_str, db)
+        self._pool_size = int(pool_size)
+        self._min_pool_size = int(min_pool_size)
         # Name mangling is ok, but these should really be stored in encrypted memory
         if username is str and password is str:
             self.__username = str(username)
@@ -402,10 +450,10 @@ class MongoProvider(DatabaseProvider):
 
 
     @staticmethod
-    @contextmanager
-    def get_connection(conn_str, db, username=None, password=None):
+    @asynccontextmanager
+    async def get_connection(conn_str, db, username=None, password=None):
         """Generator function that creates a temporary MongoProvider instance to
-        be used within a context manager.
+        be used within an asynchronous context manager.
 
         This method shall be implemented as a generator function, shall yield
         an instance of a DatabaseProvider, and shall close the provider when
@@ -420,7 +468,18 @@ class MongoProvider(DatabaseProvider):
         conn = MongoProvider(conn_str, db, username, password)
         conn.open()
         yield conn
-        conn.close()
+        await conn.close()
+
+
+    def _client_kwargs(self):
+        """Returns the keyword arguments shared by every client this provider
+        creates.
+        """
+        kwargs = {}
+        if self.__username is not None and self.__password is not None:
+            kwargs['username'] = self.__username
+            kwargs['password'] = self.__password
+        return kwargs
 
 
     async def close(self):
@@ -437,54 +496,55 @@ class MongoProvider(DatabaseProvider):
         'docs/DB.rst'. This command will fail-soft if the database already
         exists.
 
+        Initialization runs before the event loop starts, so it uses its own
+        short-lived synchronous client rather than the providers Motor client.
+
         Arguments:
             migration (boolean): Whether the database is a migration database
             or not (default: False).
         """
-        if not self._open:
-            print('Cannot initialize database, connection not open!')
-            return
         try:
-            if self._db in self._conn.list_database_names():
-                if input('Senslify Database detected, do you want to delete it? [y|n]: ').lower() == 'y':
-                    print('Warning: Deleting Senslify database!')
-                    self._conn.drop_database(self._db)
-                else:
-                    # otherwise exit the method, no initialization needed
-                    return
-            # create the indexes on the collections in the database
-            print('Initializing Senslify database...')
-            self._conn[self._db].readings.create_index([
-                ("sensorid", pymongo.ASCENDING),
-                ("groupid", pymongo.ASCENDING),
-                ("rtypeid", pymongo.ASCENDING),
-                ("ts", pymongo.ASCENDING)], unique=True
-            )
-            if not migration:
-                self._conn[self._db].sensors.create_index([
+            with pymongo.MongoClient(self._conn_str, **self._client_kwargs()) as conn:
+                if self._db in conn.list_database_names():
+                    if input('Senslify Database detected, do you want to delete it? [y|n]: ').lower() == 'y':
+                        print('Warning: Deleting Senslify database!')
+                        conn.drop_database(self._db)
+                    else:
+                        # otherwise exit the method, no initialization needed
+                        return
+                # create the indexes on the collections in the database
+                print('Initializing Senslify database...')
+                conn[self._db].readings.create_index([
                     ("sensorid", pymongo.ASCENDING),
-                    ("groupid", pymongo.ASCENDING)], unique=True
-                )
-                self._conn[self._db].groups.create_index([
-                    ("groupid", pymongo.ASCENDING)], unique=True
-                )
-                self._conn[self._db].rtypes.create_index([
+                    ("groupid", pymongo.ASCENDING),
                     ("rtypeid", pymongo.ASCENDING),
-                    ("rtype", pymongo.ASCENDING)], unique=True
+                    ("ts", pymongo.ASCENDING)], unique=True
                 )
-                # insert starting rtypes into the database
-                #   if you want more rtypes in the database than this, you'll need to
-                #   insert them through the Mongo shell, I don't provide a way to do so
-                # or you know, you could modify this list too, but it will require
-                #   reinitializing the database, deleting anything in there currently
-                self._conn[self._db].rtypes.insert_many([
-                    # Note that these rtypes match up with the ReadForward TOS App
-                    {"rtypeid": 0, "rtype": "Temperature"},
-                    {"rtypeid": 1, "rtype": "Humidity"},
-                    {"rtypeid": 2, "rtype": "Visible Light"},
-                    {"rtypeid": 3, "rtype": "Infrared Light"},
-                    {"rtypeid": 4, "rtype": "Voltage"}
-                ])
+                if not migration:
+                    conn[self._db].sensors.create_index([
+                        ("sensorid", pymongo.ASCENDING),
+                        ("groupid", pymongo.ASCENDING)], unique=True
+                    )
+                    conn[self._db].groups.create_index([
+                        ("groupid", pymongo.ASCENDING)], unique=True
+                    )
+                    conn[self._db].rtypes.create_index([
+                        ("rtypeid", pymongo.ASCENDING),
+                        ("rtype", pymongo.ASCENDING)], unique=True
+                    )
+                    # insert starting rtypes into the database
+                    #   if you want more rtypes in the database than this, you'll need to
+                    #   insert them through the Mongo shell, I don't provide a way to do so
+                    # or you know, you could modify this list too, but it will require
+                    #   reinitializing the database, deleting anything in there currently
+                    conn[self._db].rtypes.insert_many([
+                        # Note that these rtypes match up with the ReadForward TOS App
+                        {"rtypeid": 0, "rtype": "Temperature"},
+                        {"rtypeid": 1, "rtype": "Humidity"},
+                        {"rtypeid": 2, "rtype": "Visible Light"},
+                        {"rtypeid": 3, "rtype": "Infrared Light"},
+                        {"rtypeid": 4, "rtype": "Voltage"}
+                    ])
         except Exception as e:
             raise DBError(f'ERROR: {str(e)}')
 
@@ -503,21 +563,24 @@ class MongoProvider(DatabaseProvider):
             raise DBError('ERROR: Cannot delete group from database, database connection is not open!')
         count = 0
         try:
-            count += self._conn[self._db].readings.delete_many(
+            result = await self._conn[self._db].readings.delete_many(
                 filter={
                     'groupid': groupid
                 }
             )
-            count += self._conn[self._db].sensors.delete_many(
+            count += result.deleted_count
+            result = await self._conn[self._db].sensors.delete_many(
                 filter={
                     'groupid': groupid
                 }
             )
-            count += self._conn[self._db].groups.delete_one(
+            count += result.deleted_count
+            result = await self._conn[self._db].groups.delete_one(
                 filter={
                     'groupid': groupid
                 }
             )
+            count += result.deleted_count
         except Exception as e:
             raise DBError(f'ERROR: {str(e)}')
         return count
@@ -538,7 +601,7 @@ class MongoProvider(DatabaseProvider):
         if not self._open:
             raise DBError('ERROR: Cannot delete reading from database, database connection is not open!')
         try:
-            return self._conn[self._db].readings.delete_one(
+            result = await self._conn[self._db].readings.delete_one(
                 filter={
                     'sensorid': sensorid, 
                     'groupid': groupid, 
@@ -546,6 +609,7 @@ class MongoProvider(DatabaseProvider):
                     'ts': ts
                 }
             )
+            return result.deleted_count
         except Exception as e:
             raise DBError(f'ERROR: {str(e)}')
 
@@ -570,7 +634,8 @@ class MongoProvider(DatabaseProvider):
                 query={'sensorid': sensorid, 'groupid': groupid, 'rtypeid': rtypeid}
             else:
                 query={'sensorid': sensorid, 'groupid': groupid}
-            count += self._conn[self._db].readings.delete_many(filter=query)
+            result = await self._conn[self._db].readings.delete_many(filter=query)
+            count += result.deleted_count
         except Exception as e:
             raise DBError(f'ERROR: {str(e)}')
         return count
@@ -590,16 +655,18 @@ class MongoProvider(DatabaseProvider):
             raise DBError('ERROR: Cannot delete reading type from database, database connection is not open!')
         count = 0
         try:
-            count += self._conn[self._db].readings.delete_many(
+            result = await self._conn[self._db].readings.delete_many(
                 filter={
                     'rtypeid': rtypeid
                 }
             )
-            count += self._conn[self._db].rtypes.delete_one(
+            count += result.deleted_count
+            result = await self._conn[self._db].rtypes.delete_one(
                 filter={
                     'rtypeid': rtypeid
                 }
             )
+            count += result.deleted_count
         except Exception as e:
             raise DBError(f'ERROR: {str(e)}')
         return count
@@ -620,18 +687,20 @@ class MongoProvider(DatabaseProvider):
             raise DBError('ERROR: Cannot delete sensor from database, database connection is not open!')
         count = 0
         try:
-            count += self._conn[self._db].readings.delete_many(
+            result = await self._conn[self._db].readings.delete_many(
                 filter={
                     'groupid': groupid, 
                     'sensorid': sensorid
                 }
             )
-            count += self._conn[self._db].sensors.delete_one(
+            count += result.deleted_count
+            result = await self._conn[self._db].sensors.delete_one(
                 filter={
                     'groupid': groupid, 
                     'sensorid': sensorid
                 }
             )
+            count += result.deleted_count
         except Exception as e:
             raise DBError(f'ERROR: {str(e)}')
         return count
@@ -646,7 +715,7 @@ class MongoProvider(DatabaseProvider):
         if not self._open:
             raise DBError('ERROR: Cannot determine if group exists, database connection not open!')
         try:
-            return self._conn[self._db].groups.find_one(
+            return await self._conn[self._db].groups.find_one(
                 filter={'groupid': groupid}) is not None
         except Exception as e:
             raise DBError(f'ERROR: {str(e)}')
@@ -661,7 +730,7 @@ class MongoProvider(DatabaseProvider):
         if not self._open:
             raise DBError('Cannot determine if rtype exists, database connection not open!')
         try:
-            return self._conn[self._db].rtypes.find_one(
+            return await self._conn[self._db].rtypes.find_one(
                 filter={'rtypeid': rtypeid}) is not None
         except Exception as e:
             raise DBError(f'ERROR: {str(e)}')
@@ -676,7 +745,7 @@ class MongoProvider(DatabaseProvider):
         if not self._open:
             raise DBError('Cannot determine if sensor exists, database connection not open!')
         try:
-            return self._conn[self._db].sensors.find_one(
+            return await self._conn[self._db].sensors.find_one(
                     filter={'sensorid': sensorid,
                             'groupid': groupid}) is not None
         except Exception as e:
@@ -697,11 +766,10 @@ class MongoProvider(DatabaseProvider):
             }
         ]
         try:
-            with self._conn[self._db].groups.aggregate(pipeline,
-                allowDiskUse=True, maxTimeMS=self.MAX_AGGREGATE_MS) as cursor:
-                doc = cursor.next()
-                if not doc: raise DBError
-                return doc
+            docs = await self._conn[self._db].groups.aggregate(pipeline,
+                allowDiskUse=True, maxTimeMS=self.MAX_AGGREGATE_MS).to_list(length=1)
+            if not docs: raise DBError
+            return docs[0]
         except Exception as e:
             raise DBError(f'ERROR: {str(e)}')
 
@@ -735,11 +803,10 @@ class MongoProvider(DatabaseProvider):
             }
         ]
         try:
-            with self._conn[self._db].sensors.aggregate(pipeline,
-                allowDiskUse=True, maxTimeMS=self.MAX_AGGREGATE_MS) as cursor:
-                doc = cursor.next()
-                if not doc: raise DBError
-                return doc
+            docs = await self._conn[self._db].sensors.aggregate(pipeline,
+                allowDiskUse=True, maxTimeMS=self.MAX_AGGREGATE_MS).to_list(length=1)
+            if not docs: raise DBError
+            return docs[0]
         except Exception as e:
             raise DBError(f'ERROR: {str(e)}')
 
@@ -753,10 +820,27 @@ class MongoProvider(DatabaseProvider):
         if not self._open:
             raise DBError('Cannot get groups, database connection not open!')
         try:
-            with self._conn[self._db].groups.find({},
-                    {'_id': False}) as cursor:
-                for doc in cursor:
-                    yield doc
+            async for doc in self._conn[self._db].groups.find({}, {'_id': False}):
+                yield doc
+        except Exception as e:
+            raise DBError(f'ERROR: {str(e)}')
+
+
+    async def get_groups_list(self, length=None):
+        """Returns the groups in the database as a list. The cursor is drained
+        in a single call rather than awaiting each document.
+
+        Args:
+            length (int): The maximum number of groups to return (default: None, all groups).
+
+        Returns:
+            (list): A list of the groups in the database.
+        """
+        if not self._open:
+            raise DBError('Cannot get groups, database connection not open!')
+        try:
+            return await self._conn[self._db].groups.find({},
+                {'_id': False}).to_list(length=length)
         except Exception as e:
             raise DBError(f'ERROR: {str(e)}')
 
@@ -778,9 +862,12 @@ class MongoProvider(DatabaseProvider):
                 filters = {"sensorid":sensorid, "groupid":groupid, "rtypeid":rtypeid}
             else:
                 filters = {"sensorid":sensorid, "groupid":groupid}
-            with self._conn[self._db].readings.find(filters, {"_id":False}).sort("ts", pymongo.DESCENDING).limit(limit) as cursor:
-                for doc in cursor:
-                    yield doc
+            # match the batch size to the limit so the readings arrive in a
+            #   single round trip
+            cursor = self._conn[self._db].readings.find(filters, {"_id":False}) \
+                .sort("ts", pymongo.DESCENDING).limit(limit).batch_size(limit)
+            async for doc in cursor:
+                yield doc
         except Exception as e:
             raise DBError(f'ERROR: {str(e)}')
 
@@ -794,10 +881,9 @@ class MongoProvider(DatabaseProvider):
         if not self._open:
             raise DBError('Cannot get rtypes, database connection not open!')
         try:
-            with self._conn[self._db].rtypes.find({}, {'_id': False}) as cursor:
-                for doc in cursor:
-                    yield doc
-        except Exception:
+            async for doc in self._conn[self._db].rtypes.find({}, {'_id': False}):
+                yield doc
+        except Exception as e:
             raise DBError(f'ERROR: {str(e)}')
 
 
@@ -812,9 +898,8 @@ class MongoProvider(DatabaseProvider):
             raise DBError('Cannot get sensors, database connection not open!')
         try:
             groupid = int(groupid)
-            with self._conn[self._db].sensors.find({'groupid': groupid}, {'_id': False}) as cursor:
-                for doc in cursor:
-                    yield doc
+            async for doc in self._conn[self._db].sensors.find({'groupid': groupid}, {'_id': False}):
+                yield doc
         except Exception as e:
             raise DBError(f'ERROR: {str(e)}')
 
@@ -831,7 +916,7 @@ class MongoProvider(DatabaseProvider):
         groupid = int(groupid)
         try:
             if not await self.does_group_exist(groupid):
-                self._conn[self._db].groups.insert_one(
+                await self._conn[self._db].groups.insert_one(
                     {
                         "groupid": groupid,
                         "alias": alias
@@ -856,7 +941,7 @@ class MongoProvider(DatabaseProvider):
             lim = len(readings)
             while index < lim:
                 step = batch_size if index + batch_size < lim else lim - index
-                self._conn[self._db].readings.insert_many(readings[index:index+step])
+                await self._conn[self._db].readings.insert_many(readings[index:index+step])
                 index += step
         except Exception as e:
             return False, DBError(f'ERROR: {str(e)}')
@@ -875,7 +960,7 @@ class MongoProvider(DatabaseProvider):
             raise DBError('Cannot insert sensor, database connection not open!')
         try:
             if not await self.does_sensor_exist(sensorid, groupid):
-                self._conn[self._db].sensors.insert_one({
+                await self._conn[self._db].sensors.insert_one({
                     'sensorid': sensorid,
                     'groupid': groupid,
                     'alias': alias
@@ -886,19 +971,19 @@ class MongoProvider(DatabaseProvider):
 
 
     def open(self):
-        """Opens a connection to the backing database server."""
+        """Opens a connection to the backing database server. Motor binds
+        itself to the running event loop, so this should be called from within
+        the loop (see database_startup_handler).
+        """
         if not self._open:
             try:
-                if self.__username is not None and self.__password is not None:
-                    self._conn = pymongo.MongoClient(
-                        self._conn_str,
-                        username=self.__username,
-                        password=self.__password
-                    )
-                else:
-                    self._conn = pymongo.MongoClient(
-                        self._conn_str
-                    )
+                self._conn = motor.motor_asyncio.AsyncIOMotorClient(
+                    self._conn_str,
+                    maxPoolSize=self._pool_size,
+                    minPoolSize=self._min_pool_size,
+                    waitQueueTimeoutMS=self.WAIT_QUEUE_TIMEOUT_MS,
+                    **self._client_kwargs()
+                )
                 self._open = True
             except Exception as e:
                 raise DBError(f'ERROR: {str(e)}')
@@ -1008,11 +1093,10 @@ class MongoProvider(DatabaseProvider):
             }}
         ]
         try:
-            # run the aggregation
-            doc = None
-            with self._conn[self._db].readings.aggregate(pipeline,
-                    allowDiskUse=True, maxTimeMS=self.MAX_AGGREGATE_MS) as cursor:
-                doc = cursor.next()
+            # run the aggregation, $facet always yields a single document
+            docs = await self._conn[self._db].readings.aggregate(pipeline,
+                    allowDiskUse=True, maxTimeMS=self.MAX_AGGREGATE_MS).to_list(length=1)
+            doc = docs[0] if docs else None
             # build the stats container
             stats = dict()
             if doc and doc['min'] and doc['max'] and doc['avg']:
@@ -1075,9 +1159,26 @@ class MongoProvider(DatabaseProvider):
                     "val": 1}
                 }
             ]
-            with self._conn[self._db].readings.aggregate(pipeline,
-                    allowDiskUse=True, maxTimeMS=self.MAX_AGGREGATE_MS) as cursor:
-                for doc in cursor:
+            async for doc in self._conn[self._db].readings.aggregate(pipeline,
+                    allowDiskUse=True, maxTimeMS=self.MAX_AGGREGATE_MS):
+                yield doc
+        except Exception as e:
+            raise DBError(f'ERROR: {str(e)}')
+
+
+    async def watch_readings(self):
+        """Generator function that yields readings as they are inserted into
+        the database by any server process. Uses a change stream, which
+        requires MongoDB to run as a replica set.
+        """
+        if not self._open:
+            raise DBError('Cannot watch readings, database connection not open!')
+        try:
+            pipeline = [{"$match": {"operationType": "insert"}}]
+            async with self._conn[self._db].readings.watch(pipeline) as stream:
+                async for change in stream:
+                    doc = change["fullDocument"]
+                    doc.pop("_id", None)
                     yield doc
         except Exception as e:
             raise DBError(f'ERROR: {str(e)}')
@@ -1127,7 +1228,7 @@ class _GenericSQLProvider(DatabaseProvider):
             raise DBError('ERROR: Cannot determine if group exists. Database connection is not open!')
         try:
             self._conn.close()
-            self._is_open = False
+            self._open = False
         except Exception as e:
             raise DBError(str(e))
 
@@ -1143,8 +1244,9 @@ class _GenericSQLProvider(DatabaseProvider):
             migration (boolean): Whether the database is a migration database
             or not (default: True).
         """
-        if not self._open:
-            raise DBError('ERROR: Cannot determine if group exists. Database connection is not open!')
+        # initialization runs ahead of the startup handlers, the connection is
+        #   closed again afterwards so each worker process opens its own
+        self.open()
         try:
             with self._conn.cursor() as cursor:
                 if not migration:
@@ -1161,6 +1263,9 @@ class _GenericSQLProvider(DatabaseProvider):
             raise DBError(str(e))
         finally:
             self._conn.commit()
+            self._conn.close()
+            self._conn = None
+            self._open = False
 
 
     async def delete_group(self, groupid):
@@ -1401,6 +1506,27 @@ class _GenericSQLProvider(DatabaseProvider):
             raise DBError(f'ERROR: {str(e)}')
 
 
+    async def get_groups_list(self, length=None):
+        """Returns the groups in the database as a list in a single call.
+
+        Args:
+            length (int): The maximum number of groups to return (default: None, all groups).
+
+        Returns:
+            (list): A list of the groups in the database.
+        """
+        if not self._open:
+            raise DBError('ERROR: Cannot determine if group exists. Database connection is not open!')
+        try:
+            with self._conn.cursor() as cursor:
+                cursor.execute('SELECT * FROM GROUPS')
+                if length is None:
+                    return cursor.fetchall()
+                return cursor.fetchmany(length)
+        except Exception as e:
+            raise DBError(f'ERROR: {str(e)}')
+
+
     async def get_rtypes(self):
         """Generator function used to get reading types from the database."""
         if not self._open:
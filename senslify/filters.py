@@ -13,11 +13,33 @@
 # Author: Christen Ford
 # Purpose: Houses filter functions for use with rendering via aiohttp_jinja2.
 
-import babel.dates
 import datetime
+
+from senslify import serialize
+
+
+# strftime formats for the datetime formats supported by filter_datetime,
+#   the day of the month in the full format is not zero padded
+_FMT_MEDIUM = "%a %d.%m.%Y %H:%M:%S"
+_FMT_FULL = "%A, {day}. %B %Y at %H:%M:%S"
     
 
-def filter_date(d, locale='en'):
+def _to_datetime(dt):
+    """Converts a Unix timestamp into a UTC datetime, datetimes are returned
+    as is.
+
+    Args:
+        dt (int/float/datetime): A Unix timestamp or datetime.
+
+    Returns:
+        (datetime): The datetime corresponding to `dt`.
+    """
+    if isinstance(dt, datetime.datetime):
+        return dt
+    return datetime.datetime.fromtimestamp(dt, tz=datetime.timezone.utc)
+
+
+def filter_date(d):
     """Filters a Unix timestamp into a YYYY-MM-DD format suitable for 
     HTML date input controls.
     
@@ -27,26 +49,35 @@ def filter_date(d, locale='en'):
     Returns:
         (str): Date string in the form YYYY-MM-DD.
     """
-    d = datetime.datetime.fromtimestamp(d).date()
-    return babel.dates.format_date(d, 'YYYY-MM-dd', locale=locale)
+    return datetime.date.fromtimestamp(d).strftime('%Y-%m-%d')
 
 
-def filter_datetime(dt, fmt='medium', locale='en'):
-    """'i18n' compliant datetime filter for jinja2.
+def filter_datetime(dt, fmt='medium'):
+    """Datetime filter for jinja2.
     Taken from: https://stackoverflow.com/questions/4830535/how-do-i-format-a-date-in-jinja2
     
     Args:
-        dt (datetime): The datetime instance to format.
+        dt (datetime): The datetime instance or Unix timestamp to format, 
+        timestamps are formatted in UTC.
         fmt (str): The format to use, either medium or full.
     """
-    if fmt == 'full':
-        fmt = "EEEE, d. MMMM y 'at' HH:mm:ss"
-    elif fmt == 'medium':
-        fmt = "EE dd.MM.y HH:mm:ss"
+    dt = _to_datetime(dt)
     # return medium dateformat by default
-    else:
-        fmt = "EE dd.MM.y HH:mm:ss"
-    return babel.dates.format_datetime(dt, fmt, locale=locale)
+    if fmt == 'full':
+        return dt.strftime(_FMT_FULL.format(day=dt.day))
+    return dt.strftime(_FMT_MEDIUM)
+
+
+def filter_json(obj):
+    """Serializes an object to a JSON string for jinja2.
+
+    Args:
+        obj (object): The object to serialize.
+
+    Returns:
+        (str): The JSON representation of `obj`.
+    """
+    return serialize.dumps(obj).decode()
     
 
 def filter_reading(reading):
@@ -57,7 +88,8 @@ def filter_reading(reading):
     """
     if type(reading) is not dict:
         return 'Unable to generate format string, reading is not a dict!'
-    if 'ts' not in reading or 'val' not in reading:
+    ts = reading.get('ts')
+    val = reading.get('val')
+    if ts is None or val is None:
         return 'Unable to generate format string, reading does not contain all necessary information!'
-    dt = filter_datetime(reading['ts'])
-    return 'Time: {}, Value: {}'.format(dt, reading['val'])
+    return 'Time: {}, Value: {}'.format(_to_datetime(ts).strftime(_FMT_MEDIUM), val)
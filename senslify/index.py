@@ -13,34 +13,31 @@
 # Author: Christen Ford
 # Purpose: Defines handlers for the index page.
 
-import aiohttp, aiohttp_jinja2
+import functools
+
+import aiohttp_jinja2
 
 from senslify.errors import generate_error, traceback_str
 
 
-def build_sensors_url(request, group):
-    """Helper function that creates a url for a given group.
+# the maximum number of groups listed on the index page
+MAX_GROUPS = 1000
 
-    Arguments:
-        request (aiohttp.web.Request): The request that initiated the connection to the homepage.
-        group (int): Group information on one group from the database.
+
+@functools.lru_cache(maxsize=256)
+def _group_url(base_url, groupid, alias):
+    """Builds the url to the sensors page for a group. The set of groups is
+    small and rarely changes so the urls are cached across requests.
+
+    Args:
+        base_url (yarl.URL): The url of the sensors route.
+        groupid (int): The id of the group.
+        alias (str): The alias of the group.
 
     Returns:
-        (aiohttp.web.Response): An aiohttp.web.Response object.
+        (str): The url to the sensors page for the group.
     """
-    try:
-        route = request.app.router['sensors'].url_for().with_query(
-            {
-                'groupid': group['groupid'],
-                'alias': group['alias']
-            }
-        )
-        return route
-    except Exception as e:
-        if request.app.config['debug']:
-            return generate_error(traceback_str(e), 403)
-        else:
-            return generate_error('ERROR: Internal server issue occurred!', 403)
+    return str(base_url.with_query({'groupid': groupid, 'alias': alias}))
 
 
 @aiohttp_jinja2.template('sensors/index.jinja2')
@@ -53,17 +50,15 @@ async def index_handler(request):
     Returns:
         (aiohttp.web.Response): An aiohttp.web.Response object.
     """
-    # can't pass the generator off for now, need to refactor this so we can
     groups = []
     try:
-        # get the group information from the database
-        async for group in request.app['db'].get_groups():
-            url = build_sensors_url(request, group)
-            # if there was an error building the info url, return the error page
-            if isinstance(url, aiohttp.web.Response):
-                return url
-            group['url'] = url
-            groups.append(group)
+        # resolve the sensors route once, the url for each group only differs
+        #   by its query string
+        base_url = request.app.router['sensors'].url_for()
+        # get the group information from the database in one batch
+        groups = await request.app['db'].get_groups_list(length=MAX_GROUPS)
+        for group in groups:
+            group['url'] = _group_url(base_url, group['groupid'], group['alias'])
     except Exception as e:
         if request.app.config['debug']:
             return generate_error(traceback_str(e), 403)
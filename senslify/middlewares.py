@@ -0,0 +1,36 @@
+# THERE IS NO WARRANTY FOR THE PROGRAM, TO THE EXTENT PERMITTED BY
+# APPLICABLE LAW. EXCEPT WHEN OTHERWISE STATED IN WRITING THE COPYRIGHT
+# HOLDERS AND/OR OTHER PARTIES PROVIDE THE PROGRAM "AS IS" WITHOUT
+# WARRANTY OF ANY KIND, EITHER EXPRESSED OR IMPLIED, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE. THE ENTIRE RISK AS TO THE QUALITY AND
+# PERFORMANCE OF THE PROGRAM IS WITH YOU. SHOULD THE PROGRAM PROVE
+# DEFECTIVE, YOU ASSUME THE COST OF ALL NECESSARY SERVICING, REPAIR OR
+# CORRECTION.
+
+# Name: middlewares.py
+# Since: Oct. 14th, 2026
+# Author: Senslify contributors
+# Purpose: Defines middlewares applied to every request handled by the server.
+
+import aiohttp
+
+
+@aiohttp.web.middleware
+async def compression_middleware(request, handler):
+    """Enables compression on HTTP responses. The encoding (gzip or deflate)
+    is negotiated with the client through its Accept-Encoding header.
+    WebSocket responses are prepared by their handler and are skipped, they
+    are compressed through permessage-deflate instead.
+
+    Args:
+        request (aiohttp.web.Request): The incoming request.
+        handler (coroutine): The handler for the request.
+
+    Returns:
+        (aiohttp.web.StreamResponse): The response produced by the handler.
+    """
+    response = await handler(request)
+    if not response.prepared:
+        response.enable_compression()
+    return response
@@ -18,8 +18,9 @@
 #   they will always return data in the body of the Response as a serialized
 #   JSON object.
 
+import json
+
 import aiohttp
-import simplejson
 from random_word import RandomWords
 
 from senslify.errors import generate_error, traceback_str, DBError
@@ -65,14 +66,15 @@ async def _download_handler(request, params):
         end_ts = int(params['end_ts'])
         resp_body = dict()
         # call the appropriate db handler based on target
-        resp_body['readings'] = await request.db.get_readings_by_period(sensorid, groupid, start_ts, end_ts)
+        resp_body['readings'] = [doc async for doc in request.app['db'].get_readings_by_period(
+            sensorid, groupid, start_ts, end_ts)]
     except Exception as e:
         if request.app['config'].debug:
             return aiohttp.web.Response(traceback_str(e), 403)
         else:
             return aiohttp.web.Response('ERROR: Unable to understand target/parameters!', 403)
     # the standard return - if we got here, then everything went ok
-    return aiohttp.web.Response(body=simplejson.dumps(resp_body))
+    return aiohttp.web.Response(body=json.dumps(resp_body))
 
 
 async def _find_handler(request, params):
@@ -94,21 +96,21 @@ async def _find_handler(request, params):
         target = params['target']
         # target handler for groups
         if target == 'groups':
-            for doc in request.app['db'].get_groups():
+            async for doc in request.app['db'].get_groups():
                 docs.append(doc)
         # target handler for rtypes
         elif target == 'rtypes':
-            for doc in request.app['db'].get_rtypes():
+            async for doc in request.app['db'].get_rtypes():
                 docs.append(doc)
         # target handler for sensors
         elif target == 'sensors':
             groupid = params['groupid']
-            for doc in request.app['db'].get_sensors(groupid):
+            async for doc in request.app['db'].get_sensors(groupid):
                 docs.append(doc)
         elif target == 'readings':
             sensorid = params['sensorid']
             groupid = params['groupid']
-            for doc in request.app['db'].get_readings(sensorid, groupid):
+            async for doc in request.app['db'].get_readings(sensorid, groupid):
                 docs.append(doc)
     except Exception as e:
         if request.app.config['debug']:
@@ -119,7 +121,7 @@ async def _find_handler(request, params):
     # build and return the response
     resp_body = []
     resp_body['docs'] = docs
-    return aiohttp.web.Response(body=simplejson.dumps(resp_body))
+    return aiohttp.web.Response(body=json.dumps(resp_body))
 
 
 async def _stats_handler(request, params):
@@ -154,7 +156,7 @@ async def _stats_handler(request, params):
         else:
             return generate_error('ERROR: There was an issue understanding your request!', 403)
     # the standard return - if we got here, then everything went ok
-    return aiohttp.web.Response(body=simplejson.dumps(resp_body))
+    return aiohttp.web.Response(body=json.dumps(resp_body))
 
 
 async def _provision_handler(request, params):
@@ -202,7 +204,7 @@ async def _provision_handler(request, params):
         resp_body['sensor_alias'] = sensor_alias
         if group_inserted:
             resp_body['group_alias'] = group_alias
-        return aiohttp.web.Response(text=simplejson.dumps(resp_body), status=200)
+        return aiohttp.web.Response(text=json.dumps(resp_body), status=200)
     elif target == 'group':
         if 'alias' in params:
             group_alias = params['alias']
@@ -227,7 +229,7 @@ async def _provision_handler(request, params):
         resp_body = dict()
         resp_body['groupid'] = groupid
         resp_body['group_alias'] = group_alias
-        return aiohttp.web.Response(text=simplejson.dumps(resp_body), status=200)
+        return aiohttp.web.Response(text=json.dumps(resp_body), status=200)
     else:
         return generate_error('ERROR: Invalid \'target\' specified! Must be one of \{\'sensor\', \'group\'\}.', 400)
 
@@ -244,8 +246,10 @@ async def _upload_handler(request, params):
         for reading in readings:
             # generate the string version of the message for output on page
             reading['rstring'] = filter_reading(reading)
-            # send the message to the room
-            await message(request.app['rooms'], reading['groupid'], reading['sensorid'], reading)
+            # send the message to the room, with multiple workers every
+            #   worker relays the inserted readings to its own rooms instead
+            if request.app['workers'] == 1:
+                await message(request.app['rooms'], reading['groupid'], reading['sensorid'], reading)
         # insert into database
         await request.app['db'].insert_readings(readings)
     except Exception as e:
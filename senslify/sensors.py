@@ -14,7 +14,6 @@
 # Description: Handles routes intended for the /sensors base route.
 
 import aiohttp, aiohttp_jinja2, asyncio
-import simplejson
 
 from datetime import datetime
 
@@ -0,0 +1,41 @@
+# THERE IS NO WARRANTY FOR THE PROGRAM, TO THE EXTENT PERMITTED BY
+# APPLICABLE LAW. EXCEPT WHEN OTHERWISE STATED IN WRITING THE COPYRIGHT
+# HOLDERS AND/OR OTHER PARTIES PROVIDE THE PROGRAM "AS IS" WITHOUT
+# WARRANTY OF ANY KIND, EITHER EXPRESSED OR IMPLIED, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE. THE ENTIRE RISK AS TO THE QUALITY AND
+# PERFORMANCE OF THE PROGRAM IS WITH YOU. SHOULD THE PROGRAM PROVE
+# DEFECTIVE, YOU ASSUME THE COST OF ALL NECESSARY SERVICING, REPAIR OR
+# CORRECTION.
+
+# Name: serialize.py
+# Since: Oct. 14th, 2026
+# Author: Senslify contributors
+# Purpose: Provides the JSON serializer used for WebSocket frames. orjson is
+#   used where it is available, the standard library json module otherwise
+#   (e.g. on PyPy). dumps always returns bytes.
+
+try:
+    import orjson
+
+    dumps = orjson.dumps
+    loads = orjson.loads
+    JSONDecodeError = orjson.JSONDecodeError
+except ImportError:
+    import json
+
+    def dumps(obj):
+        """Serializes an object to JSON.
+
+        Args:
+            obj (object): The object to serialize.
+
+        Returns:
+            (bytes): The UTF-8 encoded JSON representation of `obj`.
+        """
+        return json.dumps(obj).encode('utf-8')
+
+    loads = json.loads
+    # json.loads raises UnicodeDecodeError rather than JSONDecodeError for
+    #   bytes that are not valid UTF-8, both are ValueErrors
+    JSONDecodeError = ValueError
@@ -14,102 +14,321 @@
 # Description: Defines a handler for the info page WebSocket as well as various
 #   helper functions.
 
+import asyncio, collections, operator
+
 import aiohttp
-import simplejson
 
+from senslify import serialize
 from senslify.errors import DBError, generate_error
 from senslify.filters import filter_reading
 from senslify.verify import verify_ws_request
 
 
-#
-# Define WebSocket command methods
-#
+# the number of readings sent per RESP_STREAM_CHUNK message
+STREAM_CHUNK_SIZE = 50
 
-def _does_room_exist(rooms, groupid, sensorid):
-    """ Determines if there is a room for a given sensor or not.
+# the number of readings sent per RESP_DOWNLOAD_CHUNK message
+DOWNLOAD_CHUNK_SIZE = 1000
 
-    Args:
-        rooms (dict): A dictionary containing sensor rooms.
-        groupid (int): The groupid corresponding to the room to check.
-        sensorid (int): The sensorid corresponding to the room to check.
+# the number of frames queued for a WebSocket before broadcasts to it are
+#   dropped
+OUTBOX_SIZE = 256
+
+# the maximum number of queued broadcasts merged into a single WebSocket frame
+OUTBOX_BATCH_SIZE = 64
+
+# the number of bytes after which no more broadcasts are merged into a frame
+OUTBOX_BATCH_BYTES = 1 << 16
+
+# the number of seconds readings for a stream are collected before they are
+#   sent to its subscribers as a single message
+COALESCE_S = 0.02
+
+# the maximum number of readings collected into a single message
+COALESCE_SIZE = 128
+
+# the maximum number of WebSockets closed at once during shutdown
+SHUTDOWN_CONCURRENCY = 512
+
+# the number of seconds to wait before restarting a failed reading watch
+WATCH_RETRY_S = 5
+
+# extract the fields of a verified command in a single call, the verifiers
+#   have already cast them to int
+_IDS = operator.itemgetter("sensorid", "groupid")
+_STREAM_IDS = operator.itemgetter("sensorid", "groupid", "rtypeid")
+_STATS_FIELDS = operator.itemgetter("sensorid", "groupid", "rtypeid", "start_ts", "end_ts")
+_DOWNLOAD_FIELDS = operator.itemgetter("sensorid", "groupid", "start_ts", "end_ts")
+
+# responses that never change are serialized once up front
+_RESP_STREAM_BEGIN = serialize.dumps({"cmd": "RESP_STREAM_BEGIN"})
+_RESP_STREAM_END = serialize.dumps({"cmd": "RESP_STREAM_END"})
+_RESP_DOWNLOAD_DONE = serialize.dumps({"cmd": "RESP_DOWNLOAD_DONE"})
+_ERR_BAD_JSON = serialize.dumps({"cmd": "RESP_ERROR",
+    "error": "ERROR: Request is not a properly formed JSON message!"})
+_ERR_CHANGE_STREAM = serialize.dumps({"cmd": "RESP_ERROR",
+    "error": "ERROR: Unable to change stream!"})
+_ERR_STREAM_DB = serialize.dumps({"cmd": "RESP_ERROR",
+    "error": "ERROR: There was an issue retrieving the top 100 readings for the new reading type from the database!"})
+_ERR_STATS_DB = serialize.dumps({"cmd": "RESP_STATS_ERROR",
+    "error": "ERROR: Cannot retrieve reading statistics, there was an issue with the database!"})
+_ERR_DOWNLOAD_DB = serialize.dumps({"cmd": "RESP_DOWNLOAD_ERROR",
+    "error": "ERROR: Cannot retrieve readings for download, there was an issue with the database!"})
+
+
+class _Outbox:
+    """The outbound queue of a single WebSocket. Every frame sent to the
+    WebSocket goes through a single writer task. Broadcasts queued at the
+    same time are merged into one JSON array frame, they never wait on a slow
+    client and are dropped once its queue is full. Responses to the clients
+    own commands are sent as frames of their own and their sender waits until
+    the frame is written, so a command streaming many responses only holds
+    one of them at a time.
     """
-    if not (groupid, sensorid) in rooms:
-        return False
-    return True
 
+    __slots__ = ("ws", "queue", "task")
 
-def _does_ws_exist(rooms, groupid, sensorid, ws):
-    """Determines if a WebSocket exists in the given room or not.
+    def __init__(self, ws):
+        self.ws = ws
+        # holds (payload, future) pairs, future is None for broadcasts
+        self.queue = asyncio.Queue(OUTBOX_SIZE)
+        self.task = asyncio.ensure_future(self._drain())
 
-    Args:
-        rooms (dict): A dictionary containing sensor rooms.
-        groupid (int): The groupid corresponding to the room to check attendance for.
-        sensorid (int): The sensorid corresponding to the room to check attendance for.
-        ws (aiohttp.web.WebSocketResponse): The WebSocket to check for.
+
+    async def _drain(self):
+        """Sends the queued frames to the WebSocket until cancelled."""
+        queue = self.queue
+        held = None
+        while True:
+            if held is None:
+                payload, written = await queue.get()
+            else:
+                payload, written = held
+                held = None
+            if written is None:
+                # merge the broadcasts queued behind this one, stopping at the
+                #   first response so it is not delayed or merged
+                batch = [payload]
+                size = len(payload)
+                while (len(batch) < OUTBOX_BATCH_SIZE and size < OUTBOX_BATCH_BYTES
+                        and not queue.empty()):
+                    item = queue.get_nowait()
+                    if item[1] is not None:
+                        held = item
+                        break
+                    batch.append(item[0])
+                    size += len(item[0])
+                payload = b"[" + b",".join(batch) + b"]"
+            try:
+                await self.ws.send_bytes(payload)
+            except Exception:
+                # keep draining so senders never block on a dead client,
+                #   the connection is torn down by ws_handler
+                pass
+            finally:
+                if written is not None and not written.done():
+                    written.set_result(None)
+
+
+    def offer(self, payload):
+        """Queues a frame without waiting, used for broadcasts.
+
+        Args:
+            payload (bytes): A serialized JSON object.
+
+        Returns:
+            (boolean): True if the frame was queued, False if the queue is full.
+        """
+        try:
+            self.queue.put_nowait((payload, None))
+            return True
+        except asyncio.QueueFull:
+            return False
+
+
+    async def send(self, payload):
+        """Sends a frame and waits until it has been written. Used for
+        responses to the clients own commands which must not be dropped.
+
+        Args:
+            payload (bytes): A serialized JSON object.
+        """
+        written = asyncio.get_event_loop().create_future()
+        await self.queue.put((payload, written))
+        await written
+
+
+    def close(self):
+        """Stops the writer task, any frames still queued are discarded."""
+        self.task.cancel()
+        while not self.queue.empty():
+            written = self.queue.get_nowait()[1]
+            if written is not None:
+                written.cancel()
+
+
+class Room:
+    """The clients subscribed to a single sensor. Subscribers are the outboxes
+    of their WebSockets and are indexed by the reading type they stream, so a
+    reading only visits the subscribers that want it, and by subscriber, so a
+    subscriber can be moved or removed without scanning the room.
     """
-    if not _does_room_exist(rooms, groupid, sensorid):
-        return False
-    if ws not in rooms[(groupid, sensorid)]:
-        return False
-    return True
 
+    __slots__ = ("by_rtype", "ws_rtype", "pending")
+
+    def __init__(self):
+        # maps rtypeid -> set of subscribers streaming that reading type
+        self.by_rtype = collections.defaultdict(set)
+        # maps subscriber -> the rtypeid it streams
+        self.ws_rtype = dict()
+        # maps rtypeid -> readings collected but not yet sent
+        self.pending = dict()
 
-async def _leave(rooms, groupid, sensorid, ws):
+
+    def __contains__(self, outbox):
+        return outbox in self.ws_rtype
+
+
+    def __len__(self):
+        return len(self.ws_rtype)
+
+
+    def add(self, outbox, rtypeid=0):
+        """Subscribes a client to a reading type, replacing any reading
+        type it was previously subscribed to.
+
+        Args:
+            outbox (_Outbox): The outbox of the WebSocket to subscribe.
+            rtypeid (int): The reading type to subscribe to (default: 0).
+        """
+        self.discard(outbox)
+        self.ws_rtype[outbox] = rtypeid
+        self.by_rtype[rtypeid].add(outbox)
+
+
+    def discard(self, outbox):
+        """Removes a client from the room, does nothing if the client is not
+        in the room.
+
+        Args:
+            outbox (_Outbox): The outbox of the WebSocket to remove.
+        """
+        rtypeid = self.ws_rtype.pop(outbox, None)
+        if rtypeid is None:
+            return
+        subscribers = self.by_rtype[rtypeid]
+        subscribers.discard(outbox)
+        if not subscribers:
+            del self.by_rtype[rtypeid]
+
+
+    def subscribers(self, rtypeid):
+        """Returns the subscribers streaming a reading type.
+
+        Args:
+            rtypeid (int): The reading type.
+
+        Returns:
+            (set): The subscribed outboxes, or None if there are none.
+        """
+        return self.by_rtype.get(rtypeid)
+
+
+    def sockets(self):
+        """Returns the outbox of every WebSocket in the room."""
+        return self.ws_rtype.keys()
+
+
+#
+# Define WebSocket command methods
+#
+
+async def _leave(rooms, groupid, sensorid, outbox):
     """Allows a WebSocket to leave a room
 
     Args:
         rooms (dict): A dictionary contaiing sensor rooms.
         groupid (int): The groupid corresponding to the room to leave.
         sensorid (int): The sensorid corresponding to the room to leave.
-        ws (aiohttp.web.WebSocketResponse): The WebSocket requesting to leave the room.
+        outbox (_Outbox): The outbox of the WebSocket requesting to leave the room.
     """
-    # only delete the ws from the room if room exists and the ws is in the room
-    if not _does_ws_exist(rooms, groupid, sensorid, ws):
+    room = rooms.get((groupid, sensorid))
+    if room is None:
         return
-    del rooms[(groupid, sensorid)][ws]
+    room.discard(outbox)
+    # drop the room once the last client leaves so rooms do not accumulate
+    if not room:
+        del rooms[(groupid, sensorid)]
 
 
-async def _join(rooms, groupid, sensorid, ws):
+async def _join(rooms, groupid, sensorid, outbox):
     """Allows a WebSocket to join a room.
 
     Args:
-        rooms (dict): A dictionary containing sensor rooms.
+        rooms (collections.defaultdict): A dictionary containing sensor rooms.
         groupid (int): The groupid corresponding to the room to join.
         sensorid (int): The sensorid corresponding to the room to join.
-        ws (aiohttp.web.WebSocketResponse): The WebSocket to add to the room.
+        outbox (_Outbox): The outbox of the WebSocket to add to the room.
     """
-    try:
-        # create the room if it does not exist
-        if sensorid not in rooms:
-            rooms[(groupid, sensorid)] = dict()
-        # add the client to the room if its not already there, default to temp
-        if ws not in rooms[(groupid, sensorid)]:
-            rooms[(groupid, sensorid)][ws] = 0
-        return True
-    except Exception:
-        return False
+    # rooms is a defaultdict, the room is created if it does not exist
+    room = rooms[(groupid, sensorid)]
+    # add the client to the room if its not already there, default to temp
+    if outbox not in room:
+        room.add(outbox, 0)
+    return True
 
 
-async def _change_stream(rooms, groupid, sensorid, ws, rtypeid):
+async def _change_stream(rooms, groupid, sensorid, outbox, rtypeid):
     """Changes the data stream the WebSocket receives.
 
     Args:
         rooms (dict): A dictionary containing sensor rooms.
         groupid (int): The groupid corresponding to the room the WebSocket is in.
         sensorid (int): The sensorid corresponding to the room the WebSocket is in.
-        ws (aiohttp.web.WebSocketResponse): The WebSocket to change stream for.
+        outbox (_Outbox): The outbox of the WebSocket to change stream for.
         rtypeid (int): The stream type to change to.
     """
-    # check if the ws exists, return if so
-    if not _does_ws_exist(rooms, groupid, sensorid, ws):
+    room = rooms.get((groupid, sensorid))
+    # the ws has to join the room before it can change streams
+    if room is None or outbox not in room:
         return False
-    rooms[(groupid, sensorid)][ws] = int(rtypeid)
+    room.add(outbox, int(rtypeid))
     return True
 
 
+def _flush(rooms, groupid, sensorid, rtypeid):
+    """Sends the readings collected for a stream to its subscribers as a
+    single message.
+
+    Args:
+        rooms (dict): A dictionary containing the sensor rooms.
+        groupid: The groupid corresponding to the room to message.
+        sensorid (int): The sensorid corresponding to the room to message.
+        rtypeid (int): The reading type of the collected readings.
+    """
+    room = rooms.get((groupid, sensorid))
+    if room is None:
+        return
+    readings = room.pending.pop(rtypeid, None)
+    subscribers = room.subscribers(rtypeid)
+    if not readings or not subscribers:
+        return
+    # serialize once, every client in the room receives the same payload
+    payload = serialize.dumps({"cmd": "RESP_READING", "readings": readings})
+    # queue the readings for every client without waiting on any of them,
+    #   a slow client misses readings rather than delaying the others
+    for outbox in list(subscribers):
+        if outbox.ws.closed:
+            room.discard(outbox)
+        else:
+            outbox.offer(payload)
+    if not room and rooms.get((groupid, sensorid)) is room:
+        del rooms[(groupid, sensorid)]
+
+
 async def message(rooms, groupid, sensorid, msg):
-    """Sends a message to the participants of a room.
+    """Sends a message to the participants of a room. Readings arriving
+    within COALESCE_S seconds of each other are sent as a single message.
 
     Args:
         rooms (dict): A dictionary containing the sensor rooms.
@@ -117,29 +336,192 @@ async def message(rooms, groupid, sensorid, msg):
         sensorid (int): The sensorid corresponding to the room to message.
         msg (dict): The message to send to all room participants (usually a reading).
     """
-    # only send the message if the room exists
-    if not _does_room_exist(rooms, groupid, sensorid):
+    # only send the message if the room exists and has clients, get() does
+    #   not create a room
+    room = rooms.get((groupid, sensorid))
+    if not room:
         return
-    # add additional fields to the message
-    # create the response object for the websocket
-    resp = dict()
-    resp["cmd"] = "RESP_READING"
-    resp["readings"] = [{
-        "rtypeid": msg["rtypeid"],
-        "ts": msg["ts"],
-        "val": msg["val"],
-        "rstring": msg["rstring"]
-    }]
     try:
         # get the rtype, so we only send to clients that ask for it specifically
         rtypeid = msg["rtypeid"]
     except KeyError:
         print("ERROR: KeyError has occurred sending message, 'rtypeid' not found!")
         return
-    # steps through all clients in the room
-    for ws, rtype in rooms[(groupid, sensorid)].items():
-        if rtype == rtypeid:
-            await ws.send_str(simplejson.dumps(resp))
+    # only the clients streaming this reading type receive the message
+    if not room.subscribers(rtypeid):
+        return
+    # collect the reading, the first reading of a batch schedules the flush
+    readings = room.pending.get(rtypeid)
+    if readings is None:
+        readings = room.pending[rtypeid] = []
+        asyncio.get_running_loop().call_later(COALESCE_S, _flush, rooms,
+            groupid, sensorid, rtypeid)
+    readings.append({
+        "rtypeid": rtypeid,
+        "ts": msg["ts"],
+        "val": msg["val"],
+        "rstring": msg["rstring"]
+    })
+    # bound the batch, the flush already scheduled for it then sends the
+    #   readings collected after this point early
+    if len(readings) >= COALESCE_SIZE:
+        _flush(rooms, groupid, sensorid, rtypeid)
+
+
+#
+# Define WebSocket command handlers
+#
+
+async def _handle_join(rooms, db, outbox, js, state):
+    """Adds the requesting WebSocket as a receiver for messages from the
+    indicated sensor.
+
+    Args:
+        rooms (dict): A dictionary containing sensor rooms.
+        db (DatabaseProvider): The database provider of the application.
+        outbox (_Outbox): The outbox of the WebSocket that sent the command.
+        js (dict): The decoded command.
+        state (dict): The per-connection state of the WebSocket.
+    """
+    sensorid, groupid = _IDS(js)
+    result = await _join(rooms, groupid, sensorid, outbox)
+    if result:
+        state["rooms"].add((groupid, sensorid))
+    await outbox.send(serialize.dumps({"cmd": "RESP_JOIN", "join_status": result}))
+
+
+async def _handle_close(rooms, db, outbox, js, state):
+    """Closes the connection at the clients request.
+
+    Args:
+        rooms (dict): A dictionary containing sensor rooms.
+        db (DatabaseProvider): The database provider of the application.
+        outbox (_Outbox): The outbox of the WebSocket that sent the command.
+        js (dict): The decoded command.
+        state (dict): The per-connection state of the WebSocket.
+    """
+    sensorid, groupid = _IDS(js)
+    await _leave(rooms, groupid, sensorid, outbox)
+    state["rooms"].discard((groupid, sensorid))
+    await outbox.ws.close()
+
+
+def _stream_chunk(readings):
+    """Serializes a RESP_STREAM_CHUNK message. The readings are formatted
+    here in a single pass over the chunk rather than while the cursor is
+    being read, with the same filter_reading used for live readings.
+
+    Args:
+        readings (list): The readings in the chunk, must not be empty.
+
+    Returns:
+        (bytes): The serialized message.
+    """
+    for reading in readings:
+        reading["rstring"] = filter_reading(reading)
+    return serialize.dumps({"cmd": "RESP_STREAM_CHUNK", "readings": readings})
+
+
+async def _handle_stream(rooms, db, outbox, js, state):
+    """Switches the WebSocket to a different reading type and sends it the
+    most recent readings for the new stream.
+
+    Args:
+        rooms (dict): A dictionary containing sensor rooms.
+        db (DatabaseProvider): The database provider of the application.
+        outbox (_Outbox): The outbox of the WebSocket that sent the command.
+        js (dict): The decoded command.
+        state (dict): The per-connection state of the WebSocket.
+    """
+    sensorid, groupid, rtypeid = _STREAM_IDS(js)
+    # change the stream, the ws is only in rooms it has already joined
+    status = await _change_stream(rooms, groupid, sensorid, outbox, rtypeid)
+    if not status:
+        await outbox.send(_ERR_CHANGE_STREAM)
+        return
+    # stream the top 100 readings for the new stream to the client in
+    #   chunks so delivery starts before the cursor is drained
+    await outbox.send(_RESP_STREAM_BEGIN)
+    chunk = []
+    try:
+        async for reading in db.get_readings(sensorid, groupid, rtypeid):
+            chunk.append(reading)
+            if len(chunk) == STREAM_CHUNK_SIZE:
+                await outbox.send(_stream_chunk(chunk))
+                chunk = []
+    except DBError as e:
+        print(e)
+        await outbox.send(_ERR_STREAM_DB)
+        return
+    if chunk:
+        await outbox.send(_stream_chunk(chunk))
+    # let the client know the stream is complete
+    await outbox.send(_RESP_STREAM_END)
+
+
+async def _handle_stats(rooms, db, outbox, js, state):
+    """Sends the WebSocket the stats for a sensor over a period of time.
+
+    Args:
+        rooms (dict): A dictionary containing sensor rooms.
+        db (DatabaseProvider): The database provider of the application.
+        outbox (_Outbox): The outbox of the WebSocket that sent the command.
+        js (dict): The decoded command.
+        state (dict): The per-connection state of the WebSocket.
+    """
+    sensorid, groupid, rtypeid, start_ts, end_ts = _STATS_FIELDS(js)
+    # get stats info from the database
+    try:
+        stats = await db.stats_sensor(sensorid,
+            groupid, rtypeid, start_ts, end_ts)
+    except DBError:
+        await outbox.send(_ERR_STATS_DB)
+        return
+    # send the response to the client
+    await outbox.send(serialize.dumps({"cmd": "RESP_SENSOR_STATS", "stats": stats}))
+
+
+async def _handle_download(rooms, db, outbox, js, state):
+    """Sends the WebSocket every reading for a sensor over a period of time.
+    The readings are sent in RESP_DOWNLOAD_CHUNK messages followed by a
+    RESP_DOWNLOAD_DONE message.
+
+    Args:
+        rooms (dict): A dictionary containing sensor rooms.
+        db (DatabaseProvider): The database provider of the application.
+        outbox (_Outbox): The outbox of the WebSocket that sent the command.
+        js (dict): The decoded command.
+        state (dict): The per-connection state of the WebSocket.
+    """
+    sensorid, groupid, start_ts, end_ts = _DOWNLOAD_FIELDS(js)
+    # send the readings as they come off the cursor, a long period is never
+    #   held in memory or serialized at once
+    chunk = []
+    try:
+        async for doc in db.get_readings_by_period(sensorid,
+            groupid, start_ts, end_ts):
+            chunk.append(doc)
+            if len(chunk) == DOWNLOAD_CHUNK_SIZE:
+                await outbox.send(serialize.dumps({"cmd": "RESP_DOWNLOAD_CHUNK", "data": chunk}))
+                chunk = []
+    except DBError as e:
+        print(e)
+        await outbox.send(_ERR_DOWNLOAD_DB)
+        return
+    if chunk:
+        await outbox.send(serialize.dumps({"cmd": "RESP_DOWNLOAD_CHUNK", "data": chunk}))
+    await outbox.send(_RESP_DOWNLOAD_DONE)
+
+
+# maps WebSocket commands to their handlers, commands are verified before
+#   they are dispatched
+_WS_DISPATCH = {
+    "RQST_JOIN": _handle_join,
+    "RQST_CLOSE": _handle_close,
+    "RQST_STREAM": _handle_stream,
+    "RQST_SENSOR_STATS": _handle_stats,
+    "RQST_DOWNLOAD": _handle_download
+}
 
 
 # Defines the handler for the info page WebSocket
@@ -151,121 +533,91 @@ async def ws_handler(request):
     """
     ws = None
     try:
-        ws = aiohttp.web.WebSocketResponse(autoclose=False)
+        ws = aiohttp.web.WebSocketResponse(autoclose=False,
+            compress=request.app["ws_compress"])
         await ws.prepare(request)
     except aiohttp.web.WSServerHandshakeError:
         return generate_error("ERROR: Unable to establish WebSocket, handshake failed!", 400)
 
-    async for msg in ws:
-        if msg.type == aiohttp.WSMsgType.TEXT:
-            # decode the received message
-            #   every value in js will be a string, cast as necessary
-            js = None
-            resp = dict()
-            resp["cmd"] = ""
-            try:
-                js = simplejson.loads(msg.data)
-            except simplejson.JSONDecodeError:
-                resp["cmd"] = "RESP_ERROR"
-                resp["error"] = "ERROR: Request is not a properly formed JSON message!"
-                # send the response to the client
-                await ws.send_str(simplejson.dumps(resp))
-                continue
-            status, reason = await verify_ws_request(request, js)
-            if not status:
-                resp["cmd"] = "RESP_ERROR"
-                resp["error"] = reason
-                await ws.send_str(simplejson.dumps(resp))
-                continue
-            cmd = js["cmd"]
-            # 
-            # adds the requesting websocket as a receiver for messages from
-            #   the indicated sensor
-            if cmd == "RQST_JOIN":
-                sensorid = int(js["sensorid"])
-                groupid = int(js["groupid"])
-                result = await _join(request.app["rooms"], groupid, sensorid, ws)
-                resp["cmd"] = "RESP_JOIN"
-                resp["join_status"] = result
-                await ws.send_str(simplejson.dumps(resp))
-            # close the connection if the client requested it
-            elif cmd == "RQST_CLOSE":
-                sensorid = int(js["sensorid"])
-                groupid = int(js["groupid"])
-                await _leave(request.app["rooms"], groupid, sensorid, ws)
-                await ws.close()
-                break
-            # handle requests from users to switch to a different reading type
-            elif cmd == "RQST_STREAM":
-                sensorid = int(js["sensorid"])
-                groupid = int(js["groupid"])
-                rtypeid = int(js["rtypeid"])
-                # change the stream
-                status = await _change_stream(request.app["rooms"], groupid, sensorid, ws, rtypeid)
-                # construct a response containing the top 100 readings for the stream
-                resp["cmd"] = "RESP_STREAM"
-                if status:
-                    readings = []
-                    try:
-                        async for reading in request.app["db"].get_readings(sensorid, groupid, rtypeid):
-                            reading["rstring"] = filter_reading(reading)
-                            readings.append(reading)
-                    except DBError as e:
-                        print(e)
-                        resp["cmd"] = "RESP_ERROR"
-                        resp["error"] = "ERROR: There was an issue retrieving the top 100 readings for the new reading type from the database!"
-                        await ws.send_str(simplejson.dumps(resp))
-                        continue
-                    resp["readings"] = readings
-                else:
-                    resp["cmd"] = "RESP_ERROR"
-                    resp["error"] = "ERROR: Unable to change stream!"
-                # send the response to the client
-                await ws.send_str(simplejson.dumps(resp))
-            # handle requests for getting stats on sensors
-            elif cmd == "RQST_SENSOR_STATS":
-                sensorid = int(js["sensorid"])
-                groupid = int(js["groupid"])
-                rtypeid = int(js["rtypeid"])
-                start_ts = int(js["start_ts"])
-                end_ts = int(js["end_ts"])
-                resp["cmd"] = "RESP_SENSOR_STATS"
-                # get stats info from the database
-                try:
-                    resp["stats"] = await request.app["db"].stats_sensor(sensorid,
-                        groupid, rtypeid, start_ts, end_ts)
-                except DBError:
-                    resp["cmd"] = "RESP_STATS_ERROR"
-                    resp["error"] = "ERROR: Cannot retrieve reading statistics, there was an issue with the database!"
-                # send the response to the client
-                await ws.send_str(simplejson.dumps(resp))
-            elif cmd == "RQST_DOWNLOAD":
-                sensorid = int(js["sensorid"])
-                groupid = int(js["groupid"])
-                start_ts = int(js["start_ts"])
-                end_ts = int(js["end_ts"])
-                resp["cmd"] = "RESP_DOWNLOAD"
+    # bind the application resources once rather than on every message
+    rooms = request.app["rooms"]
+    db = request.app["db"]
+
+    # every frame sent to the WebSocket goes through its outbox
+    outbox = _Outbox(ws)
+
+    # the rooms the WebSocket has joined, it leaves all of them on disconnect
+    state = {"rooms": set()}
+
+    try:
+        async for msg in ws:
+            # the info page sends binary frames, they skip the UTF-8 validation
+            #   aiohttp applies to text frames, the JSON parser validates anyway
+            if msg.type == aiohttp.WSMsgType.BINARY or msg.type == aiohttp.WSMsgType.TEXT:
+                # decode the received message
+                #   every value in js will be a string, cast as necessary
+                js = None
                 try:
-                    data = []
-                    async for doc in request.app["db"].get_readings_by_period(sensorid,
-                        groupid, start_ts, end_ts):
-                        data.append(doc)
-                    resp["data"] = data
-                except Exception as e:
-                    resp["cmd"] = "RESP_DOWNLOAD_ERROR"
-                    resp["error"] = "ERROR: Cannot retrieve readings for download, there was an issue with the database!"
-                await ws.send_str(simplejson.dumps(resp))
-        elif msg.type == aiohttp.WSMsgType.ERROR:
-            resp = dict()
-            resp["cmd"] == "RESP_WS_ERROR"
-            resp["error"] = "ERROR: WebSocket encountered an error: %s\nPlease refresh the page.".format(ws.exception())
-            await ws.send_str(simplejson.dumps(resp))
-
-    await _leave(request.app["rooms"], groupid, sensorid, ws)
+                    js = serialize.loads(msg.data)
+                except serialize.JSONDecodeError:
+                    await outbox.send(_ERR_BAD_JSON)
+                    continue
+                status, reason = await verify_ws_request(request, js)
+                if not status:
+                    await outbox.send(serialize.dumps({"cmd": "RESP_ERROR", "error": reason}))
+                    continue
+                handler = _WS_DISPATCH.get(js["cmd"])
+                if handler:
+                    await handler(rooms, db, outbox, js, state)
+                # stop reading once a handler has closed the connection
+                if ws.closed:
+                    break
+            elif msg.type == aiohttp.WSMsgType.ERROR:
+                await outbox.send(serialize.dumps({
+                    "cmd": "RESP_WS_ERROR",
+                    "error": "ERROR: WebSocket encountered an error: {}\nPlease refresh the page.".format(ws.exception())
+                }))
+    finally:
+        for groupid, sensorid in state["rooms"]:
+            await _leave(rooms, groupid, sensorid, outbox)
+        outbox.close()
 
     return ws
 
 
+async def _watch_readings(app):
+    """Relays readings inserted by any server process to the rooms of this
+    process. Only used when the server runs multiple worker processes, as
+    each worker only holds the rooms of its own WebSockets.
+
+    Args:
+        app (aiohttp.web.Application): The web application hosting the sensor rooms.
+    """
+    rooms = app["rooms"]
+    while True:
+        try:
+            async for reading in app["db"].watch_readings():
+                reading["rstring"] = filter_reading(reading)
+                await message(rooms, reading["groupid"], reading["sensorid"], reading)
+        except NotImplementedError:
+            print("ERROR: The database provider cannot relay readings between workers!")
+            return
+        except DBError as e:
+            print(e)
+        await asyncio.sleep(WATCH_RETRY_S)
+
+
+async def socket_startup_handler(app):
+    """Defines a handler that starts relaying readings between worker
+    processes when the server runs more than one.
+
+    Args:
+        app (aiohttp.web.Application): The web application hosting the sensor rooms.
+    """
+    if app["workers"] > 1:
+        app["reading_watch"] = asyncio.ensure_future(_watch_readings(app))
+
+
 async def socket_shutdown_handler(app):
     """Defines a handler for shutting down any connected WebSockets when the
     server goes down.
@@ -273,10 +625,20 @@ async def socket_shutdown_handler(app):
     Args:
         app (aiohttp.web.Application): The web application hosting the sensor rooms.
     """
-    # close any open websockets
-    for groupid, sensor in app["rooms"].keys():
-        for ws in app["rooms"][(groupid, sensor)].keys():
-            if not ws.closed:
-                # close the WebSocket
-                await ws.close(code=aiohttp.WSCloseCode.GOING_AWAY,
-                       message="Server shutdown")
+    # stop relaying readings from the other workers
+    if "reading_watch" in app:
+        app["reading_watch"].cancel()
+    # snapshot the open websockets first in a single pass over the rooms,
+    #   closing them changes the rooms
+    sockets = [outbox.ws for room in list(app["rooms"].values())
+        for outbox in list(room.sockets()) if not outbox.ws.closed]
+    # close the websockets concurrently, bounded so a large server does not
+    #   start thousands of close handshakes at once
+    semaphore = asyncio.Semaphore(SHUTDOWN_CONCURRENCY)
+
+    async def close(ws):
+        async with semaphore:
+            await ws.close(code=aiohttp.WSCloseCode.GOING_AWAY,
+                message=b"Server shutdown")
+
+    await asyncio.gather(*[close(ws) for ws in sockets], return_exceptions=True)
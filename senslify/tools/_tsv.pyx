@@ -0,0 +1,54 @@
+# cython: language_level=3
+
+# THERE IS NO WARRANTY FOR THE PROGRAM, TO THE EXTENT PERMITTED BY
+# APPLICABLE LAW. EXCEPT WHEN OTHERWISE STATED IN WRITING THE COPYRIGHT
+# HOLDERS AND/OR OTHER PARTIES PROVIDE THE PROGRAM "AS IS" WITHOUT
+# WARRANTY OF ANY KIND, EITHER EXPRESSED OR IMPLIED, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE. THE ENTIRE RISK AS TO THE QUALITY AND
+# PERFORMANCE OF THE PROGRAM IS WITH YOU. SHOULD THE PROGRAM PROVE
+# DEFECTIVE, YOU ASSUME THE COST OF ALL NECESSARY SERVICING, REPAIR OR
+# CORRECTION.
+
+# Name: _tsv.pyx
+# Since: Oct. 14th, 2026
+# Author: Senslify contributors
+# Purpose: Compiled version of the fast TSV write path used by xlsx2tsv. It
+#   is built by setup.py when Cython is installed, xlsx2tsv falls back to its
+#   pure Python version otherwise. Both must produce identical output.
+
+
+cdef str _format(object value):
+    """Converts a single cell value to its TSV representation.
+
+    Args:
+        value (object): The value of the cell.
+
+    Returns:
+        (str): An empty string for empty cells, str(value) otherwise.
+    """
+    if value is None:
+        return ''
+    if type(value) is str:
+        return <str>value
+    return str(value)
+
+
+def write_tsv(rows, str path, Py_ssize_t buffering=1 << 20):
+    """Writes rows of cell values to a Tab separated value file. Cells are
+    joined directly with tabs and are not quoted.
+
+    Args:
+        rows (iterable): The rows to write, each row a sequence of cell
+        values such as the tuples produced by iter_rows(values_only=True).
+        path (str): The filepath to write to.
+        buffering (int): The size of the output buffer (default: 1 MiB).
+    """
+    cdef object row
+    cdef list cells
+    cdef object value
+    with open(path, 'wb', buffering=buffering) as tsvfile:
+        write = tsvfile.write
+        for row in rows:
+            cells = [_format(value) for value in row]
+            write(('\t'.join(cells) + '\r\n').encode('utf-8'))
@@ -1,6 +1,6 @@
-import argparse, datetime, random, time, sys
+import argparse, datetime, json, random, time, sys
 
-import requests, simplejson
+import requests
 
 
 # setup argparse so the user can change parameters from the command line
@@ -22,7 +22,7 @@ rtypeid = int(args.rtypeid)
 ip_addr = args.ip_addr
 
 # send a provisioning request joining group groupid
-json_rqst = simplejson.dumps({
+json_rqst = json.dumps({
     'cmd': 'provision',
     'params': {
         'target': 'group',
@@ -39,7 +39,7 @@ if 'group_alias' in group_json:
     group_alias = group_json['group_alias']
 
 
-json_rqst = simplejson.dumps({
+json_rqst = json.dumps({
     'cmd': 'provision',
     'params': {
         'target': 'sensor',
@@ -59,7 +59,7 @@ if 'sensor_alias' in sensor_json:
 # repeatedly generate and upload sensor data per the given interval
 while True:
     data = random.uniform(min_val, max_val)
-    json_resp = simplejson.dumps({
+    json_resp = json.dumps({
         'cmd': 'upload',
         'params':{
             'readings': [
@@ -18,7 +18,7 @@
 # This converter *should* work with indiscrimately large files without penalty.
 
 # Import standard libraries
-import csv, sys, os
+import concurrent.futures, csv, sys, os
 
 # Import click for CLI
 import click
@@ -28,6 +28,37 @@ import openpyxl as pyxl
 import openpyxl_utilities as utils
 
 
+# the size of the output buffer used by the fast write path
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+def _write_tsv(rows, path, buffering=WRITE_BUFFER_SIZE):
+    """Writes rows of cell values to a Tab separated value file. Cells are
+    joined directly with tabs and are not quoted. This is the pure Python
+    version of senslify.tools._tsv.write_tsv.
+
+    Args:
+        rows (iterable): The rows to write, each row a sequence of cell
+        values such as the tuples produced by iter_rows(values_only=True).
+        path (str): The filepath to write to.
+        buffering (int): The size of the output buffer (default: 1 MiB).
+    """
+    # one joined string and one buffered write per row, rows end in \r\n the
+    #   same as the csv writer
+    with open(path, 'wb', buffering=buffering) as tsvfile:
+        write = tsvfile.write
+        join = '\t'.join
+        for row in rows:
+            write((join(['' if value is None else str(value) for value in row]) + '\r\n').encode('utf-8'))
+
+
+# use the compiled write path if it was built at install time
+try:
+    from senslify.tools._tsv import write_tsv
+except ImportError:
+    write_tsv = _write_tsv
+
+
 def get_outfile(filepath, worksheet=None):
     """Helper function used to generate output filenames.
     
@@ -35,15 +66,10 @@ def get_outfile(filepath, worksheet=None):
         filepath (str): The path to the XLS/XLSM document.
         worksheet (str): The name of the worksheet.
     """
-    # Get the workbooks name
-    parts = filepath.split(os.pathsep)
-    filename = parts[-1]
-    # Strip off the file extension, throw an error if unsupported filetype
-    if filename.endswith('.xlsx'):
-        filename = filename.rstrip('.xlsx')
-    elif filename.endswith('.xlsm'):
-        filename = filename.rstrip('.xlsm')
-    else:
+    # Get the workbooks name and strip off the file extension, throw an error
+    #   if unsupported filetype
+    filename, ext = os.path.splitext(os.path.basename(filepath))
+    if ext.lower() not in ('.xlsx', '.xlsm'):
         raise ValueError('Unsupported filetype detected!')
     # Construct the outfile name to return
     if worksheet:
@@ -54,22 +80,49 @@ def get_outfile(filepath, worksheet=None):
     return outfile
 
 
-def write_outfile(ws_handle, outfile):
+def write_outfile(ws_handle, outfile, strict_csv=False):
     """Helper function that dumps the contents of a worksheet to a Tab 
-    separated value file.
+    separated value file. By default cells are joined directly with tabs,
+    which assumes no cell contains a tab, newline or quote. Set `strict_csv`
+    to quote such cells through the csv module instead.
     
     Args:
         ws_handle (openpyxl.worksheet.worksheet): The handle for a worksheet.
         outfile (str): The filepath to dump to.
+        strict_csv (boolean): Whether to write through the csv module 
+        (default: False).
     """
-    with open(outfile, 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile, delimiter='\t', 
-            quotechar="\"", quoting=csv.QUOTE_MINIMAL)
-        for raw_row in ws_handle.rows:
-            row = []
-            for cell in raw_row:
-                row.append(cell.value)
-            writer.writerow(row)
+    if strict_csv:
+        with open(outfile, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile, delimiter='\t', 
+                quotechar="\"", quoting=csv.QUOTE_MINIMAL)
+            # values_only skips building a Cell object for every cell, the rows
+            #   are streamed straight through the csv writer
+            writer.writerows(ws_handle.iter_rows(values_only=True))
+    else:
+        write_tsv(ws_handle.iter_rows(values_only=True), outfile, WRITE_BUFFER_SIZE)
+
+
+def convert_worksheet(infile, ws_name, outfile, strict_csv=False):
+    """Converts a single worksheet of a workbook to a TSV file. The workbook
+    is opened by this function so it can run in a worker process.
+
+    Args:
+        infile (str): Path to the input file.
+        ws_name (str): The name of the worksheet to convert.
+        outfile (str): The filepath to dump to.
+        strict_csv (boolean): Whether to write through the csv module 
+        (default: False).
+
+    Returns:
+        (str): The filepath that was written.
+    """
+    wb_handle = pyxl.load_workbook(filename=infile, read_only=True)
+    try:
+        write_outfile(wb_handle[ws_name], outfile, strict_csv)
+    finally:
+        wb_handle.close()
+    return outfile
 
 
 @click.command()
@@ -77,7 +130,8 @@ def write_outfile(ws_handle, outfile):
 @click.option('-of', '--outfile', default=None, help='The file to write the converted tsv to.')
 @click.option('-ws', '--worksheet', default=None, help='The worksheet to convert.')
 @click.option('-v', '--verbose', default=False, is_flag=True, help='Will print additional information if set.')
-def main(infile, outfile, worksheet, verbose):
+@click.option('--strict-csv', default=False, is_flag=True, help='Quote cells containing tabs, newlines or quotes, slower.')
+def main(infile, outfile, worksheet, verbose, strict_csv):
     """Attempts to convert the XLS/XLSM file pointed to by INFILE to a TSV 
     file. If there is more than one worksheet in the book, then each worksheet 
     will produce an additional tsv file with the filename: 
@@ -88,6 +142,7 @@ def main(infile, outfile, worksheet, verbose):
         outfilke (str): Path to the output file.
         worksheet (str): The name of the worksheet to convert.
         verbose (boolean): Whether to verbosely output information or not.
+        strict_csv (boolean): Whether to write through the csv module.
     """
     try:
         # Attempt to open the workbook
@@ -97,6 +152,8 @@ def main(infile, outfile, worksheet, verbose):
         if worksheet and worksheet in wb_handle:
             if not outfile:
                 outfile = get_outfile(infile, worksheet)
+            # write the outfile
+            write_outfile(wb_handle[worksheet], outfile, strict_csv)
         # Otherwise write a single sheet if the book has one page or all pages
         #   othwerise
         elif not worksheet:
@@ -105,14 +162,19 @@ def main(infile, outfile, worksheet, verbose):
                 ws_handle = wb_handle.active
                 outfile = get_outfile(infile)
                 # write the outfile
-                write_outfile(ws_handle, outfile)
+                write_outfile(ws_handle, outfile, strict_csv)
             else:
-                for ws_name in wb_handle.sheetnames:
-                    # get a handle to the current sheet, build its outfile name
-                    ws_handle = wb_handle[ws_name]
-                    outfile = get_outfile(infile, ws_name)
-                    # write the outfile
-                    write_outfile(ws_handle, outfile)
+                # the sheets are independent, convert them in parallel with
+                #   one process per core, each process opens its own handle
+                ws_names = list(wb_handle.sheetnames)
+                wb_handle.close()
+                outfiles = [get_outfile(infile, ws_name) for ws_name in ws_names]
+                with concurrent.futures.ProcessPoolExecutor() as executor:
+                    for outfile in executor.map(convert_worksheet,
+                            [infile] * len(ws_names), ws_names, outfiles,
+                            [strict_csv] * len(ws_names)):
+                        if verbose:
+                            click.echo('Wrote {}'.format(outfile))
 
     except OSError as e:
         click.secho('An OSError occurred during processing!', fg='red')
@@ -13,7 +13,31 @@
 # Author: Christen Ford
 # Description: Contains useful methods for verifying Senslify data objects.
 
-import simplejson
+
+def _parse_ints(params, *fields):
+    """Fetches and casts the integer fields of a request parameter object,
+    each field is looked up exactly once. On success the cast values are
+    written back to `params` so the command handlers do not cast them again.
+
+    Args:
+        params (dict): A dictionary containing the request parameters.
+        fields (str): The names of the fields to fetch.
+
+    Returns:
+        (list, str): The cast values in the order of `fields` and None, or None
+        and an error message if a field is missing or not an integer.
+    """
+    values = []
+    for field in fields:
+        value = params.get(field)
+        if value is None:
+            return None, f"ERROR: Request requires '{field}' field!"
+        try:
+            values.append(int(value))
+        except (TypeError, ValueError):
+            return None, "ERROR: A parameter is of incorrect type!"
+    params.update(zip(fields, values))
+    return values, None
 
 
 async def _verify_find_request(request, params):
@@ -27,6 +51,7 @@ async def _verify_find_request(request, params):
         (boolean, str): A boolean indicating if the request is valid. The other parameter is an error
         message if the boolean is True, and is None otherwise.
     """
+    db = request.app["db"]
     if not params: return False, "ERROR: Request parameters must not be null!"
     if not isinstance(params, dict):
         return False, "ERROR: Request parameters must be a JSON object!"
@@ -41,7 +66,7 @@ async def _verify_find_request(request, params):
         except Exception:
             return False, "ERROR: A parameter is of incorrect type!"
         if groupid < 0: return False, "ERROR: Request parameter 'groupid' must be >= 0!"
-        if not await request.app["db"].does_group_exist(groupid):
+        if not await db.does_group_exist(groupid):
             return False, "ERROR: No such group provisioned into the system!"
     elif target == "readings":
         if "groupid" not in params: return False, "ERROR: Request params requires 'groupid' field!"
@@ -53,9 +78,9 @@ async def _verify_find_request(request, params):
             return False, "ERROR: A parameter is on incorrect type!"
         if groupid < 0: return False, "ERROR: Request parameter 'groupid' must be >= 0!"
         if sensorid < 0: return False, "ERROR: Request parameter 'sensorid' must be >= 0!"
-        if not await request.app["db"].does_group_exist(groupid):
+        if not await db.does_group_exist(groupid):
             return False, "ERROR: No such group provisioned into the system!"
-        if not await request.app["db"].does_sensor_exist(sensorid, groupid):
+        if not await db.does_sensor_exist(sensorid, groupid):
             return False, "ERROR: No such sensor provisioned into the system!"
     return True, None
 
@@ -71,41 +96,36 @@ async def _verify_stats_request(request, params):
         (boolean, str): A boolean indicating if the request is valid. The other parameter is an error
         message if the boolean is True, and is None otherwise.
     """
+    db = request.app["db"]
     if not params: return False, "ERROR: Request parameters must not be null!"
     if not isinstance(params, dict):
         return False, "ERROR: Request parameters must be a JSON object!"
-    if "target" not in params: return False, "ERROR: Request params requires 'target' field!"
-    if "groupid" not in params: return False, "ERROR: Request params requires 'groupid' field!"
-    if "rtypeid" not in params: return False, "ERROR: Request params requires 'rtypeid' field!"
-    if "start_ts" not in params: return False, "ERROR: Request params requires 'start_ts' field!"
-    if "end_ts" not in params: return False, "ERROR: Request params requires 'end_ts' field!"
-    target = params["target"]
+    target = params.get("target")
+    if target is None: return False, "ERROR: Request params requires 'target' field!"
     if target != "group" and target != "sensor": 
         return False, "ERROR: Request parameter 'target' must be one of {'group', 'sensor'}!"
+    # sensorid is only required for the stats of a single sensor
     if target == "sensor":
-        if "sensorid" not in params: return False, "ERROR: Request params requires 'sensorid' field!"
-    try:
-        groupid = int(params["groupid"])
-        rtypeid = int(params["rtypeid"])
-        start_ts = int(params["start_ts"])
-        end_ts = int(params["end_ts"])
-        if target == "sensor": 
-            sensorid = int(params["sensorid"])
-            if sensorid < 0: return False, "ERROR: Request parameter 'sensorid' must be >= 0!"
-    except Exception:
-        return False, "ERROR: A parameter is of incorrect type!"
+        ids, reason = _parse_ints(params, "groupid", "rtypeid", "start_ts", "end_ts", "sensorid")
+        if ids is None: return False, reason
+        groupid, rtypeid, start_ts, end_ts, sensorid = ids
+    else:
+        ids, reason = _parse_ints(params, "groupid", "rtypeid", "start_ts", "end_ts")
+        if ids is None: return False, reason
+        groupid, rtypeid, start_ts, end_ts = ids
     if groupid < 0: return False, "ERROR: Request parameter 'groupid' must be >= 0!"
     if rtypeid < 0: return False, "ERROR: Request parameter 'rtypeid' must be >= 0!"
     if start_ts < 0: return False, "ERROR: Request parameter 'start_ts' must be >= 0!"
     if end_ts < 0: return False, "ERROR: Request parameter 'end_ts' must be >= 0!"
     if start_ts >= end_ts: return False, "ERROR: Request parmeter 'start_ts must be < ''end_ts!"
-    if not await request.app["db"].does_group_exist(groupid):
+    if target == "sensor" and sensorid < 0:
+        return False, "ERROR: Request parameter 'sensorid' must be >= 0!"
+    if not await db.does_group_exist(groupid):
         return False, "ERROR: No such group provisioned into the system!"
     if target == "sensor":
-        if sensorid < 0: return False, "ERROR: Request parameter 'sensorid' must be >= 0!"
-        if not await request.app["db"].does_sensor_exist(sensorid, groupid):
+        if not await db.does_sensor_exist(sensorid, groupid):
             return False, "ERROR: No such sensor provisioned into the system!"
-    if not await request.app["db"].does_rtype_exist(rtypeid):
+    if not await db.does_rtype_exist(rtypeid):
         return False, "ERROR: No such reading type provisioned into the system!"
     return True, None
 
@@ -121,28 +141,21 @@ async def _verify_download_request(request, params):
         (boolean, str): A boolean indicating if the request is valid. The other parameter is an error
         message if the boolean is True, and is None otherwise.
     """
+    db = request.app["db"]
     if not params: return False, "ERROR: Request parameters must not be null!"
     if not isinstance(params, dict):
         return False, "ERROR: Request parameters must be a JSON object!"
-    if "sensorid" not in params: return False, "ERROR: Request params requires 'sensorid' field!"
-    if "groupid" not in params: return False, "ERROR: Request params requires 'groupid' field!"
-    if "start_ts" not in params: return False, "ERROR: Request params requires 'start_ts' field!"
-    if "end_ts" not in params: return False, "ERROR: Request params requires 'end_ts' field!"
-    try:
-        groupid = int(params["groupid"])
-        sensorid = int(params["sensorid"])
-        start_ts = int(params["start_ts"])
-        end_ts = int(params["end_ts"])
-    except Exception:
-        return False, "ERROR: A parameter is of incorrect type!"
+    ids, reason = _parse_ints(params, "sensorid", "groupid", "start_ts", "end_ts")
+    if ids is None: return False, reason
+    sensorid, groupid, start_ts, end_ts = ids
     if groupid < 0: return False, "ERROR: Request parameter 'groupid' must be >= 0!"
     if sensorid < 0: return False, "ERROR: Request parameter 'sensorid' must be >= 0!"
     if start_ts < 0: return False, "ERROR: Request parameter 'start_ts' must be >= 0!"
     if end_ts < 0: return False, "ERROR: Request parameter 'end_ts' must be >= 0!"
     if start_ts >= end_ts: return False, "ERROR: Request parmeter 'start_ts must be < ''end_ts!"
-    if not await request.app["db"].does_group_exist(groupid):
+    if not await db.does_group_exist(groupid):
         return False, "ERROR: No such group provisioned into the system!"
-    if not await request.app["db"].does_sensor_exist(sensorid, groupid):
+    if not await db.does_sensor_exist(sensorid, groupid):
         return False, "ERROR: No such sensor provisioned into the system!"
     return True, None
 
@@ -158,6 +171,7 @@ async def _verify_upload_request(request, params):
         (boolean, str): A boolean indicating if the request is valid. The other parameter is an error
         message if the boolean is True, and is None otherwise.
     """
+    db = request.app["db"]
     if not params: return False, "ERROR: Request parameters must not be null!"
     if not isinstance(params, dict):
         return False, "ERROR: Request parameters must be a JSON object!"
@@ -183,11 +197,11 @@ async def _verify_upload_request(request, params):
         if sensorid < 0: return False, "ERROR: Request parameter 'sensorid' must be >= 0!"
         if rtypeid < 0: return False, "ERROR: Request parameter 'rtypeid' must be >= 0!"
         if ts < 0: return False, "ERROR: Request parameter 'ts' must be >= 0!"
-        if not await request.app["db"].does_group_exist(groupid):
+        if not await db.does_group_exist(groupid):
             return False, "ERROR: No such group provisioned into the system!"
-        if not await request.app["db"].does_sensor_exist(sensorid, groupid):
+        if not await db.does_sensor_exist(sensorid, groupid):
             return False, "ERROR: No such sensor provisioned into the system!"
-        if not await request.app["db"].does_rtype_exist(rtypeid):
+        if not await db.does_rtype_exist(rtypeid):
             return False, "ERROR: No such reading type provisioned into the system!"
     return True, None
 
@@ -233,21 +247,18 @@ async def _verify_join_command(request, params):
         (boolean, str): A boolean indicating if the request is valid. The other parameter is an error
         message if the boolean is True, and is None otherwise.
     """
+    db = request.app["db"]
     if not params: return False, "ERROR: Request parameters must not be null!"
     if not isinstance(params, dict):
         return False, "ERROR: Request parameters must be a JSON object!"
-    if "groupid" not in params: return False, "ERROR: Request requires 'groupid' field!"
-    if "sensorid" not in params: return False, "ERROR: Request requires 'sensorid' field!"
-    try:
-        groupid = int(params["groupid"])
-        sensorid = int(params["sensorid"])
-    except Exception:
-        return False, "ERROR: A parameter is of incorrect type!"
+    ids, reason = _parse_ints(params, "groupid", "sensorid")
+    if ids is None: return False, reason
+    groupid, sensorid = ids
     if groupid < 0: return False, "ERROR: Request parameter 'groupid' must be >= 0."
     if sensorid < 0: return False, "ERROR: Request parameter 'sensorid' must be >= 0."
-    if not await request.app["db"].does_group_exist(groupid):
+    if not await db.does_group_exist(groupid):
         return False, "ERROR: No such group provisioned into the system!"
-    if not await request.app["db"].does_sensor_exist(sensorid, groupid):
+    if not await db.does_sensor_exist(sensorid, groupid):
         return False, "ERROR: No such sensor provisioned into the system!"
     return True, None
 
@@ -263,21 +274,18 @@ async def _verify_close_command(request, params):
         (boolean, str): A boolean indicating if the request is valid. The other parameter is an error
         message if the boolean is True, and is None otherwise.
     """
+    db = request.app["db"]
     if not params: return False, "ERROR: Request parameters must not be null!"
     if not isinstance(params, dict):
         return False, "ERROR: Request parameters must be a JSON object!"
-    if "groupid" not in params: return False, "ERROR: Request requires 'groupid' field!"
-    if "sensorid" not in params: return False, "ERROR: Request requires 'sensorid' field!"
-    try:
-        groupid = int(params["groupid"])
-        sensorid = int(params["sensorid"])
-    except Exception:
-        return False, "ERROR: A parameter is of incorrect type!"
+    ids, reason = _parse_ints(params, "groupid", "sensorid")
+    if ids is None: return False, reason
+    groupid, sensorid = ids
     if groupid < 0: return False, "ERROR: Request parameter 'groupid' must be >= 0."
     if sensorid < 0: return False, "ERROR: Request parameter 'sensorid' must be >= 0."
-    if not await request.app["db"].does_group_exist(groupid):
+    if not await db.does_group_exist(groupid):
         return False, "ERROR: No such group provisioned into the system!"
-    if not await request.app["db"].does_sensor_exist(sensorid, groupid):
+    if not await db.does_sensor_exist(sensorid, groupid):
         return False, "ERROR: No such sensor provisioned into the system!"
     return True, None
 
@@ -293,16 +301,17 @@ async def _verify_stream_command(request, params):
         (boolean, str): A boolean indicating if the request is valid. The other parameter is an error
         message if the boolean is True, and is None otherwise.
     """
+    db = request.app["db"]
     if not params: return False, "ERROR: Request parameters must not be null!"
     if not isinstance(params, dict):
         return False, "ERROR: Request parameters must be a JSON object!"
-    if "rtypeid" not in params: return False, "ERROR: Request requires 'rtypeid' field!"
-    try:
-        rtypeid = int(params["rtypeid"])
-    except Exception:
-        return False, "ERROR: A parameter is of incorrect type!"
+    ids, reason = _parse_ints(params, "groupid", "sensorid", "rtypeid")
+    if ids is None: return False, reason
+    groupid, sensorid, rtypeid = ids
+    if groupid < 0: return False, "ERROR: Request parameter 'groupid' must be >= 0."
+    if sensorid < 0: return False, "ERROR: Request parameter 'sensorid' must be >= 0."
     if rtypeid < 0: return False, "ERROR: Request parameter 'rtypeid' must be >= 0!"
-    if not await request.app["db"].does_rtype_exist(rtypeid):
+    if not await db.does_rtype_exist(rtypeid):
         return False, "ERROR: No such reading type provisioned into the system!"
     return True, None
 
@@ -347,8 +356,10 @@ async def verify_ws_request(request, json):
         (boolean, str): A boolean indicating if the request is valid. The other parameter is an error
         message if the boolean is True, and is None otherwise.
     """
-    if "cmd" not in json: return False, "ERROR: Request requires 'cmd' field!"
-    cmd = json["cmd"]
+    if not isinstance(json, dict):
+        return False, "ERROR: Request must be a JSON object!"
+    cmd = json.get("cmd")
+    if cmd is None: return False, "ERROR: Request requires 'cmd' field!"
     if cmd == "RQST_JOIN":
         return await _verify_join_command(request, json)
     elif cmd == "RQST_CLOSE":
@@ -20,7 +20,7 @@ import os
 import sys
 from shutil import rmtree
 
-from setuptools import find_packages, setup, Command
+from setuptools import find_packages, setup, Command, Extension
 
 # Package meta-data.
 NAME = 'Senslify'
@@ -34,9 +34,9 @@ VERSION = '0.1.0'
 # What packages are required for this module to be executed?
 REQUIRED = [
     "aiohttp", "jinja2", "aiohttp-jinja2", "cchardet",
-    "config", "aiodns", "pymongo", "simplejson",
-    "markupsafe", "gevent", 'pyyaml', 'random-word',
-    'pyodbc'
+    "config", "aiodns", "motor", "pymongo",
+    "markupsafe", 'orjson; platform_python_implementation == "CPython"', 'pyyaml', 'random-word',
+    'pyodbc', 'uvloop; sys_platform != "win32"'
 ]
 
 # What packages are optional?
@@ -47,6 +47,17 @@ EXTRAS = {
     'xls2tsv': ['click', 'defusedxml', 'openpyxl', 'openpyxl-utilities'],
 }
 
+# What extensions are compiled? These are optional, each one has a pure
+#   Python fallback and is only built when Cython is installed
+try:
+    from Cython.Build import cythonize
+    EXT_MODULES = cythonize(
+        [Extension('senslify.tools._tsv', ['senslify/tools/_tsv.pyx'])],
+        language_level=3
+    )
+except ImportError:
+    EXT_MODULES = []
+
 # Are there any additonal data files needed by the project
 DATA_FILES = [
     ('', ['senslify/config/senslify.conf']),
@@ -131,10 +142,11 @@ setup(
     entry_points={
         'console_scripts': [
             'btlemon=senslify.tools.btlemon:main',
-            'senslify=senslify.__init__:main',
+            'senslify=senslify:main',
             'xlsx2tsv=senslify.tools.xlsx2tsv:main'
         ],
     },
+    ext_modules=EXT_MODULES,
     install_requires=REQUIRED,
     extras_require=EXTRAS,
     include_package_data=True,
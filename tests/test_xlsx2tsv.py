@@ -0,0 +1,60 @@
+# THERE IS NO WARRANTY FOR THE PROGRAM, TO THE EXTENT PERMITTED BY
+# APPLICABLE LAW. EXCEPT WHEN OTHERWISE STATED IN WRITING THE COPYRIGHT
+# HOLDERS AND/OR OTHER PARTIES PROVIDE THE PROGRAM "AS IS" WITHOUT
+# WARRANTY OF ANY KIND, EITHER EXPRESSED OR IMPLIED, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE. THE ENTIRE RISK AS TO THE QUALITY AND
+# PERFORMANCE OF THE PROGRAM IS WITH YOU. SHOULD THE PROGRAM PROVE
+# DEFECTIVE, YOU ASSUME THE COST OF ALL NECESSARY SERVICING, REPAIR OR
+# CORRECTION.
+
+# Name: test_xlsx2tsv.py
+# Since: Oct. 14th, 2026
+# Author: Senslify contributors
+# Purpose: Checks that the TSV write paths of xlsx2tsv produce the same
+#   output for plain cells.
+
+import pytest
+
+pyxl = pytest.importorskip("openpyxl")
+xlsx2tsv = pytest.importorskip("senslify.tools.xlsx2tsv")
+
+
+# plain cells, none contain a tab, newline or quote
+ROWS = [
+    ("sensorid", "groupid", "ts", "val"),
+    (1, 2, 1565000000, 21.0),
+    (1, 2, 1565000060, 21.5),
+    (3, None, 1565000120, -4),
+    ("a b", "c", None, None),
+]
+
+
+@pytest.fixture
+def worksheet(tmp_path):
+    """Yields a read only handle to a worksheet holding ROWS."""
+    path = str(tmp_path / "book.xlsx")
+    wb = pyxl.Workbook()
+    for row in ROWS:
+        wb.active.append(row)
+    wb.save(path)
+    wb = pyxl.load_workbook(filename=path, read_only=True)
+    yield wb.active
+    wb.close()
+
+
+def test_fast_path_matches_strict_csv(worksheet, tmp_path):
+    fast = tmp_path / "fast.tsv"
+    strict = tmp_path / "strict.tsv"
+    xlsx2tsv.write_outfile(worksheet, str(fast))
+    xlsx2tsv.write_outfile(worksheet, str(strict), strict_csv=True)
+    assert fast.read_bytes() == strict.read_bytes()
+
+
+def test_write_tsv_matches_fallback(tmp_path):
+    fallback = tmp_path / "fallback.tsv"
+    compiled = tmp_path / "compiled.tsv"
+    xlsx2tsv._write_tsv(ROWS, str(fallback))
+    # rows may be any sequence, not only the tuples openpyxl produces
+    xlsx2tsv.write_tsv([list(row) for row in ROWS], str(compiled))
+    assert compiled.read_bytes() == fallback.read_bytes()